@@ -0,0 +1,64 @@
+"""Benchmark of the parsers configfilemanager can use
+
+Generates a pseudopackage catalog of the given size in yaml and json and
+prints how long each available parser takes to load it.
+
+usage: python benchmarks/configfilemanager_benchmark.py [PACKAGES]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+import yaml
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_packagemanagers = ('apt', 'dnf', 'pacman', 'brew')
+
+
+def _catalog(size):
+    """Return a pseudopackage catalog with the given number of packages"""
+    return {'package{}'.format(i): {pm: '{}-package{}'.format(pm, i) \
+            for pm in _packagemanagers} for i in range(size)}
+
+
+def _timeit(function, path, mode):
+    """Return the time in seconds it takes to parse the file at path"""
+    start = time.perf_counter()
+    with open(path, mode) as file:
+        function(file)
+    return time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    catalog = _catalog(size)
+    with tempfile.TemporaryDirectory() as tempdir:
+        yamlpath = os.path.join(tempdir, 'pseudopackages.yaml')
+        jsonpath = os.path.join(tempdir, 'pseudopackages.json')
+        with open(yamlpath, 'w') as file:
+            yaml.safe_dump(catalog, file)
+        with open(jsonpath, 'w') as file:
+            json.dump(catalog, file)
+        parsers = [('yaml SafeLoader', yamlpath, 'r', \
+                lambda file: yaml.load(file, Loader=yaml.SafeLoader))]
+        if hasattr(yaml, 'CSafeLoader'):
+            parsers.append(('yaml CSafeLoader', yamlpath, 'rb', \
+                    lambda file: yaml.load(file, Loader=yaml.CSafeLoader)))
+        parsers.append(('json', jsonpath, 'rb', \
+                lambda file: json.loads(file.read())))
+        if orjson is not None:
+            parsers.append(('orjson', jsonpath, 'rb', \
+                    lambda file: orjson.loads(file.read())))
+        print('{} packages'.format(size))
+        for name, path, mode, function in parsers:
+            print('{:<18}{:>10.3f}s'.format(name, _timeit(function, path, mode)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import threading
+import http.server
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Serves the files of the server and redirects to them"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, body):
+        files = self.server.files
+        redirects = self.server.redirects
+        self.server.requests.append((self.command, self.path))
+        if self.path in redirects:
+            self.send_response(302)
+            self.send_header('Location', redirects[self.path])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path in files:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(files[self.path])))
+            self.send_header('ETag', '"{}"'.format(hash(files[self.path])))
+            self.end_headers()
+            if body:
+                self.wfile.write(files[self.path])
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    """Counts the connections it accepted"""
+
+    daemon_threads = True
+
+    def get_request(self):
+        self.connections += 1
+        return super().get_request()
+
+
+class HTTPServer():
+    """A local http server running in a thread, for testing downloads
+
+    instance methods:
+    url() -- returns the url of a path on the server
+    close() -- stops the server
+
+    instance variables:
+    files -- a dict mapping paths to the bytes served for them
+    redirects -- a dict mapping paths to the locations they redirect to
+    requests -- a list of tuples of the method and path of each request
+    """
+
+    def __init__(self):
+        """Constructor, starts the server"""
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.files = self.files = {}
+        self._server.redirects = self.redirects = {}
+        self._server.requests = self.requests = []
+        self._server.connections = 0
+        self._thread = threading.Thread(target=self._server.serve_forever, \
+                daemon=True)
+        self._thread.start()
+
+    @property
+    def connections(self):
+        """The number of connections the server accepted"""
+        return self._server.connections
+
+    def url(self, path):
+        """Return the url of the given path on the server
+
+        arguments:
+        path -- the path, starting with a slash
+        """
+        return 'http://127.0.0.1:{}{}'.format(self._server.server_port, path)
+
+    def close(self):
+        """Stop the server"""
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,171 @@
+import os
+import hashlib
+import tempfile
+import unittest
+from unittest import mock
+
+from tests.httpserver import HTTPServer
+from zztools.exceptions import DownloadError
+from zztools.steps.downloadstep import DownloadStep
+from zztools.utilities import downloader
+from zztools.utilities import downloadcache
+
+
+class DownloaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer()
+        self.addCleanup(self.server.close)
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.todir = self.tempdir.name
+
+    def test_download_names_file_after_url(self):
+        self.server.files['/files/tool.tar.gz'] = b'x' * 3000000
+        path = downloader.download(self.server.url('/files/tool.tar.gz'), \
+                todir=self.todir)
+        self.assertEqual(path, os.path.join(self.todir, 'tool.tar.gz'))
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), b'x' * 3000000)
+        self.assertFalse(os.path.exists(path + '.part'))
+
+    def test_download_to_file(self):
+        self.server.files['/a'] = b'content'
+        tofile = os.path.join(self.todir, 'renamed')
+        path = downloader.download(self.server.url('/a'), tofile=tofile)
+        self.assertEqual(path, tofile)
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), b'content')
+
+    def test_redirect_keeps_requested_name(self):
+        self.server.redirects['/releases/v1/tool.zip'] = '/objects/1234'
+        self.server.files['/objects/1234'] = b'zip'
+        path = downloader.download(self.server.url('/releases/v1/tool.zip'), \
+                todir=self.todir)
+        self.assertEqual(path, os.path.join(self.todir, 'tool.zip'))
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), b'zip')
+
+    def test_connections_are_reused(self):
+        for name in ('a', 'b', 'c'):
+            self.server.files['/' + name] = name.encode()
+        for name in ('a', 'b', 'c'):
+            downloader.download(self.server.url('/' + name), todir=self.todir)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(DownloadError) as context:
+            downloader.download(self.server.url('/missing'), todir=self.todir)
+        self.assertIn('404', context.exception.message)
+        self.assertEqual(os.listdir(self.todir), [])
+
+    def test_openurl_streams_body(self):
+        self.server.files['/stream'] = b'0123456789'
+        with downloader.openurl(self.server.url('/stream')) as response:
+            self.assertEqual(response.read(4), b'0123')
+            self.assertEqual(response.read(), b'456789')
+
+    def test_getvalidators(self):
+        self.server.files['/v'] = b'version'
+        url, etag, _ = downloader.getvalidators(self.server.url('/v'))
+        self.assertEqual(url, self.server.url('/v'))
+        self.assertIsNotNone(etag)
+        self.assertEqual(self.server.requests, [('HEAD', '/v')])
+
+    def test_sha256_is_verified(self):
+        self.server.files['/a'] = b'content'
+        with self.assertRaises(DownloadError):
+            downloader.download(self.server.url('/a'), todir=self.todir, \
+                    sha256='0' * 64)
+        self.assertEqual(os.listdir(self.todir), [])
+        sha256 = hashlib.sha256(b'content').hexdigest()
+        path = downloader.download(self.server.url('/a'), todir=self.todir, \
+                sha256=sha256)
+        self.assertTrue(os.path.isfile(path))
+
+
+    def test_missing_directory_is_created(self):
+        self.server.files['/a'] = b'content'
+        todir = os.path.join(self.todir, 'new', 'dir')
+        path = downloader.download(self.server.url('/a'), todir=todir)
+        self.assertEqual(path, os.path.join(todir, 'a'))
+
+    def test_step_paths_match_the_downloaded_file(self):
+        self.server.files['/dir/'] = b'index'
+        step = DownloadStep(self.server.url('/dir/'), self.todir)
+        step.execute()
+        self.assertEqual(step.getpaths()[1], \
+                [os.path.join(self.todir, 'index.html')])
+        self.assertTrue(os.path.isfile(step.getpaths()[1][0]))
+
+
+class DownloadCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer()
+        self.addCleanup(self.server.close)
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.todir = os.path.join(self.tempdir.name, 'downloads')
+        os.mkdir(self.todir)
+        patcher = mock.patch.dict(os.environ, \
+                {'XDG_CACHE_HOME': os.path.join(self.tempdir.name, 'cache')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(downloadcache, 'enabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(downloadcache, '_used', set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unchanged_file_is_revalidated(self):
+        self.server.files['/a'] = b'content'
+        downloader.download(self.server.url('/a'), todir=self.todir)
+        downloader.download(self.server.url('/a'), todir=self.todir)
+        self.assertEqual(self.server.requests, [('GET', '/a'), ('GET', '/a')])
+        self.assertEqual(len(downloadcache._readindex()), 1)
+
+    def test_placed_file_is_independent_of_the_cache(self):
+        self.server.files['/a'] = b'content'
+        path = downloader.download(self.server.url('/a'), todir=self.todir)
+        objectpath = os.path.join(downloadcache._getobjectsdir(), \
+                hashlib.sha256(b'content').hexdigest())
+        self.assertNotEqual(os.stat(path).st_ino, os.stat(objectpath).st_ino)
+        with open(path, 'wb') as file:
+            file.write(b'changed')
+        with open(objectpath, 'rb') as file:
+            self.assertEqual(file.read(), b'content')
+
+    def test_missing_directory_is_created(self):
+        self.server.files['/a'] = b'content'
+        todir = os.path.join(self.todir, 'new')
+        path = downloader.download(self.server.url('/a'), todir=todir)
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), b'content')
+
+    def test_files_of_the_run_are_not_evicted(self):
+        self.server.files['/a'] = b'a'
+        self.server.files['/b'] = b'b'
+        with mock.patch.object(downloadcache, 'max_size', 0):
+            downloader.download(self.server.url('/a'), todir=self.todir)
+            downloader.download(self.server.url('/b'), todir=self.todir)
+            self.assertEqual(len(os.listdir(downloadcache._getobjectsdir())), 2)
+            downloadcache._used.clear()
+            downloader.download(self.server.url('/b'), todir=self.todir)
+        self.assertEqual(os.listdir(downloadcache._getobjectsdir()), \
+                [hashlib.sha256(b'b').hexdigest()])
+        self.assertEqual(list(downloadcache._readindex()), \
+                [self.server.url('/b')])
+
+    def test_mismatching_sha256_is_not_indexed(self):
+        self.server.files['/a'] = b'content'
+        with self.assertRaises(DownloadError):
+            downloader.download(self.server.url('/a'), todir=self.todir, \
+                    sha256='0' * 64)
+        self.assertEqual(downloadcache._readindex(), {})
+        self.assertEqual(os.listdir(self.todir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import time
+import unittest
+from unittest import mock
+
+from zztools import scheduler
+from zztools.exceptions import StepFailedError
+from zztools.scheduler import Scheduler
+from zztools.steps.step import Step
+from zztools.todolist import TodoList
+from zztools.utilities import executor
+
+
+class _CommandStep(Step):
+    """A step executing a command, writing the given path"""
+
+    def __init__(self, name, command, path, needs=()):
+        self.name = name
+        self.command = command
+        self.path = path
+        self.needs = tuple(needs)
+        self.result = None
+
+    def getpaths(self):
+        return [], [self.path]
+
+    def execute(self):
+        self.result = executor.run_command(self.command, interactive=False)
+        self.returncode = self.result.returncode
+
+
+class RunCommandTest(unittest.TestCase):
+
+    def test_result_keeps_the_tail_of_the_output(self):
+        result = executor.run_command('seq 30', interactive=False)
+        self.assertEqual(result.returncode, 0)
+        self.assertGreaterEqual(result.duration, 0)
+        self.assertEqual(result.tail, ['{}\n'.format(number) \
+                for number in range(11, 31)])
+
+    def test_result_of_failing_command(self):
+        result = executor.run_command('false', interactive=False)
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.tail, [])
+
+
+class FailFastTest(unittest.TestCase):
+
+    def _steps(self):
+        return [_CommandStep('fails', 'false', '/tmp/a'), \
+                _CommandStep('slow', 'sleep 10', '/tmp/b'), \
+                _CommandStep('after', 'true', '/tmp/c', needs=['fails'])]
+
+    def test_failed_command_cancels_the_others(self):
+        steps = self._steps()
+        start = time.monotonic()
+        with mock.patch.object(scheduler, 'fail_fast', True):
+            with self.assertRaises(StepFailedError) as context:
+                Scheduler(TodoList(steps), 4).execute()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertIs(context.exception.step, steps[0])
+        self.assertNotEqual(steps[1].returncode, 0)
+        self.assertIsNone(steps[2].result)
+
+    def test_without_fail_fast_dependents_run(self):
+        steps = self._steps()
+        steps[1].command = 'true'
+        Scheduler(TodoList(steps), 4).execute()
+        self.assertEqual(steps[2].returncode, 0)
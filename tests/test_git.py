@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from git import Repo
+from git.exc import GitCommandError
+
+from zztools.utilities import git
+
+
+class SyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.upstream = Repo.init(os.path.join(self.tempdir.name, 'upstream'))
+        with self.upstream.config_writer() as config:
+            config.set_value('user', 'name', 'test')
+            config.set_value('user', 'email', 'test@example.com')
+        self._commit('first')
+        self.url = 'file://' + self.upstream.working_dir
+        self.todir = os.path.join(self.tempdir.name, 'checkout')
+
+    def _commit(self, content):
+        path = os.path.join(self.upstream.working_dir, 'file')
+        with open(path, 'w') as file:
+            file.write(content)
+        self.upstream.index.add(['file'])
+        self.upstream.index.commit(content)
+
+    def _read(self):
+        with open(os.path.join(self.todir, 'file')) as file:
+            return file.read()
+
+    def test_unchanged_sync_reports_no_change(self):
+        self.assertTrue(git.sync(self.url, self.todir))
+        self.assertFalse(git.sync(self.url, self.todir))
+
+    def test_sync_fast_forwards(self):
+        git.sync(self.url, self.todir)
+        self._commit('second')
+        self.assertTrue(git.sync(self.url, self.todir))
+        self.assertEqual(self._read(), 'second')
+
+    def test_shallow_sync_moves_to_new_commit(self):
+        git.sync(self.url, self.todir, depth=1)
+        self._commit('second')
+        self.assertTrue(git.sync(self.url, self.todir, depth=1))
+        self.assertEqual(self._read(), 'second')
+        self.assertFalse(Repo(self.todir).head.is_detached)
+        self.assertFalse(git.sync(self.url, self.todir, depth=1))
+
+    def test_shallow_sync_keeps_conflicting_local_changes(self):
+        git.sync(self.url, self.todir, depth=1)
+        with open(os.path.join(self.todir, 'file'), 'w') as file:
+            file.write('local')
+        self._commit('second')
+        with self.assertRaises(GitCommandError):
+            git.sync(self.url, self.todir, depth=1)
+        self.assertEqual(self._read(), 'local')
+        self.assertTrue(git.sync(self.url, self.todir, depth=1, reset=True))
+        self.assertEqual(self._read(), 'second')
+
+
+if __name__ == '__main__':
+    unittest.main()
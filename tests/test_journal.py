@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from zztools import journal
+from zztools.todolist import TodoList
+from zztools.exceptions import ConfigValueError
+from zztools.steps.step import Step
+
+
+class _Step(Step):
+    """A step recording whether it was executed"""
+
+    def __init__(self, value, returncode=0):
+        self.value = value
+        self.executed = False
+        self._returncode = returncode
+
+    def execute(self):
+        self.executed = True
+        self.returncode = self._returncode
+
+
+def _todolistjson(command):
+    """Return the json of a todolist file, the first step runs command"""
+    return {'main': [{'type': 'execute', 'command': command}, \
+            {'type': 'execute', 'command': 'true'}, \
+            {'type': 'list', 'command': {'name': 'other'}}, \
+            {'type': 'collection', 'command': {'collections': ['base']}}], \
+            'other': [{'type': 'execute', 'command': 'false'}]}
+
+
+def _stepids(json):
+    """Return the ids of the steps of the main todolist in the json"""
+    todolist = TodoList.fromjson(json, 'main')
+    journal.assignids(todolist, '0')
+    return [step.stepid for step in todolist.steps]
+
+
+class StepIdTest(unittest.TestCase):
+
+    def test_ids_are_stable(self):
+        self.assertEqual(_stepids(_todolistjson('ls')), \
+                _stepids(_todolistjson('ls')))
+
+    def test_editing_a_step_keeps_the_other_ids(self):
+        ids = _stepids(_todolistjson('ls'))
+        edited = _stepids(_todolistjson('ls -l'))
+        self.assertNotEqual(ids[0], edited[0])
+        self.assertEqual(ids[1:], edited[1:])
+
+    def test_editing_a_nested_todolist_changes_its_list_step(self):
+        json = _todolistjson('ls')
+        ids = _stepids(json)
+        json['other'][0]['command'] = 'true'
+        edited = _stepids(json)
+        self.assertNotEqual(ids[2], edited[2])
+        self.assertEqual(ids[:2] + ids[3:], edited[:2] + edited[3:])
+
+    def test_editing_another_todolist_keeps_the_ids(self):
+        json = _todolistjson('ls')
+        ids = _stepids(json)
+        json['unused'] = [{'type': 'execute', 'command': 'true'}]
+        self.assertEqual(_stepids(json), ids)
+
+
+class ValidateTest(unittest.TestCase):
+
+    def test_circular_needs_are_rejected(self):
+        json = {'main': [{'type': 'execute', 'command': 'true', 'name': 'a', \
+                'needs': 'b'}, {'type': 'execute', 'command': 'true', \
+                'name': 'b', 'needs': 'a'}]}
+        with self.assertRaises(ConfigValueError) as context:
+            TodoList.fromjson(json, 'main').validate()
+        self.assertIn('circle', context.exception.message)
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        patcher = mock.patch.dict(os.environ, \
+                {'XDG_CACHE_HOME': self.tempdir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, steps, resume=False, complete=True):
+        """Execute the steps in a journaled run"""
+        for index, step in enumerate(steps):
+            step.stepid = journal.getstepid(step, '0/{}'.format(index))
+        journal.open_journal(['run'], resume)
+        try:
+            for step in steps:
+                journal.execute(step)
+        finally:
+            journal.close_journal(complete)
+
+    def test_resume_skips_succeeded_steps(self):
+        self._run([_Step(1), _Step(2, 1)])
+        steps = [_Step(1), _Step(2)]
+        self._run(steps, resume=True)
+        self.assertEqual([step.executed for step in steps], [False, True])
+
+    def test_complete_run_is_not_resumed(self):
+        self._run([_Step(1), _Step(2)])
+        steps = [_Step(1), _Step(2)]
+        self._run(steps, resume=True)
+        self.assertEqual([step.executed for step in steps], [True, True])
+
+    def test_interrupted_run_is_resumed(self):
+        self._run([_Step(1), _Step(2)], complete=False)
+        steps = [_Step(1), _Step(2)]
+        self._run(steps, resume=True)
+        self.assertEqual([step.executed for step in steps], [False, False])
+
+    def test_unopenable_journal_is_skipped(self):
+        with open(os.path.join(self.tempdir.name, 'zztools'), 'w'):
+            pass
+        steps = [_Step(1), _Step(2)]
+        with self.assertWarns(UserWarning):
+            self._run(steps)
+        self.assertEqual([step.executed for step in steps], [True, True])
+
+    def test_unwritable_journal_is_abandoned(self):
+        steps = [_Step(1, 1), _Step(2)]
+        with mock.patch.object(journal.os, 'fsync', \
+                side_effect=OSError(28, 'No space left on device')):
+            with self.assertWarns(UserWarning):
+                self._run(steps)
+        self.assertEqual([step.executed for step in steps], [True, True])
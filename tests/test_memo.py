@@ -0,0 +1,79 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+from unittest import mock
+
+from tests.httpserver import HTTPServer
+from zztools import memo
+from zztools.steps.makestep import downloadmakesteps
+from zztools.steps.unpackstep import LocalUnpackStep, DownloadUnpackStep
+
+
+def _writetar(path, files):
+    """Write a tar archive of the dict of names and bytes to path"""
+    with tarfile.open(path, 'w') as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+class MemoUnpackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.todir = os.path.join(self.tempdir.name, 'to')
+        os.makedirs(self.todir)
+        patcher = mock.patch.dict(os.environ, \
+                {'XDG_CACHE_HOME': os.path.join(self.tempdir.name, 'cache')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name, value in (('enabled', True), ('report', [])):
+            patcher = mock.patch.object(memo, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _execute(self, step):
+        """Execute the step through the memo store, return if it was skipped"""
+        skipped = len(memo.report)
+        memo.execute(step)
+        return len(memo.report) > skipped
+
+    def test_unrelated_files_do_not_invalidate(self):
+        archive = os.path.join(self.tempdir.name, 'a.tar')
+        _writetar(archive, {'a': b'a', 'sub/b': b'b'})
+        self.assertFalse(self._execute(LocalUnpackStep(archive, self.todir)))
+        with open(os.path.join(self.todir, 'unrelated'), 'w') as file:
+            file.write('x')
+        self.assertTrue(self._execute(LocalUnpackStep(archive, self.todir)))
+
+    def test_changed_member_invalidates(self):
+        archive = os.path.join(self.tempdir.name, 'a.tar')
+        _writetar(archive, {'a': b'a', 'sub/b': b'b'})
+        self._execute(LocalUnpackStep(archive, self.todir))
+        with open(os.path.join(self.todir, 'sub', 'b'), 'w') as file:
+            file.write('changed')
+        self.assertFalse(self._execute(LocalUnpackStep(archive, self.todir)))
+        with open(os.path.join(self.todir, 'sub', 'b'), 'rb') as file:
+            self.assertEqual(file.read(), b'b')
+
+    def test_validators_are_requested_once(self):
+        server = HTTPServer()
+        self.addCleanup(server.close)
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w') as archive:
+            info = tarfile.TarInfo('a')
+            info.size = 1
+            archive.addfile(info, io.BytesIO(b'a'))
+        server.files['/a.tar'] = buffer.getvalue()
+        self._execute(DownloadUnpackStep(server.url('/a.tar'), self.todir))
+        self.assertEqual([method for method, _ in server.requests], \
+                ['HEAD', 'GET'])
+
+    def test_temporary_steps_are_not_memoized(self):
+        steps = downloadmakesteps('https://example.com/tool.tar.gz')
+        self.assertFalse(steps[0].memoize)
+        self.assertFalse(steps[1].memoize)
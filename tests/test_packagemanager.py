@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from zztools.packagemanager import PackageManager
+
+
+class BisectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pm = PackageManager('pm', 'install', 'remove', False)
+        self.installed = []
+        self.calls = 0
+
+    def _execute(self, unavailable):
+        """Return a fake _executecommand failing if a package is unavailable"""
+        def execute(command, override_sudo=None, prefix=None):
+            self.calls += 1
+            packages = command.split(' ')[1:]
+            if any(package in unavailable for package in packages):
+                return 1
+            self.installed += packages
+            return 0
+        return execute
+
+    def _bisect(self, packages, unavailable):
+        with mock.patch.object(self.pm, '_executecommand', \
+                self._execute(unavailable)):
+            return self.pm._executebisecting('install', packages)
+
+    def test_success_runs_once(self):
+        packages = ['p{}'.format(index) for index in range(8)]
+        self.assertEqual(self._bisect(packages, set()), [])
+        self.assertEqual(self.calls, 1)
+
+    def test_one_bad_package_is_isolated(self):
+        packages = ['p{}'.format(index) for index in range(8)]
+        self.assertEqual(self._bisect(packages, {'p5'}), ['p5'])
+        self.assertEqual(sorted(self.installed), \
+                sorted(set(packages) - {'p5'}))
+
+    def test_bad_packages_in_both_halves_are_isolated(self):
+        packages = ['p{}'.format(index) for index in range(8)]
+        self.assertEqual(self._bisect(packages, {'p1', 'p6'}), ['p1', 'p6'])
+        self.assertEqual(sorted(self.installed), \
+                sorted(set(packages) - {'p1', 'p6'}))
@@ -0,0 +1,65 @@
+import unittest
+
+from zztools.scheduler import Scheduler
+from zztools.steps.step import Step
+from zztools.steps.liststep import ListStep
+from zztools.todolist import TodoList
+
+
+class _Step(Step):
+    """A step with the given name, paths and needs"""
+
+    def __init__(self, name, paths=None, needs=()):
+        self.name = name
+        self.paths = paths
+        self.needs = tuple(needs)
+
+    def getpaths(self):
+        return self.paths
+
+    def execute(self):
+        pass
+
+
+def _deps(steps):
+    """Return a dict mapping the names of the steps to the names they wait for"""
+    scheduler = Scheduler(TodoList(steps), 4)
+    return {node.step.name: {dep.step.name for dep in node.deps} \
+            for node in scheduler.nodes}
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_unrelated_paths_run_concurrently(self):
+        deps = _deps([_Step('a', ([], ['/tmp/a'])), \
+                _Step('b', ([], ['/tmp/b']))])
+        self.assertEqual(deps, {'a': set(), 'b': set()})
+
+    def test_path_conflicts_are_ordered(self):
+        deps = _deps([_Step('write', ([], ['/tmp/tree'])), \
+                _Step('read', (['/tmp/tree/file'], [])), \
+                _Step('other', (['/tmp/other'], []))])
+        self.assertEqual(deps['read'], {'write'})
+        self.assertEqual(deps['other'], set())
+
+    def test_unknown_paths_are_a_barrier(self):
+        deps = _deps([_Step('a', ([], ['/tmp/a'])), _Step('barrier'), \
+                _Step('b', ([], ['/tmp/b']))])
+        self.assertEqual(deps['barrier'], {'a'})
+        self.assertEqual(deps['b'], {'barrier'})
+
+    def test_needs_keep_later_steps_behind(self):
+        deps = _deps([_Step('a', ([], ['/tmp/a'])), \
+                _Step('x', ([], ['/tmp/x'])), \
+                _Step('command', needs=['x']), \
+                _Step('make', ([], ['/tmp/tree']))])
+        self.assertEqual(deps['command'], {'x'})
+        self.assertEqual(deps['make'], {'command'})
+
+    def test_nested_lists_are_part_of_the_graph(self):
+        nested = ListStep(TodoList([_Step('inner', ([], ['/tmp/tree']))]))
+        nested.name = 'list'
+        deps = _deps([_Step('outer', (['/tmp/tree/file'], [])), nested, \
+                _Step('after', needs=['list'])])
+        self.assertEqual(deps['inner'], {'outer'})
+        self.assertEqual(deps['after'], {'inner'})
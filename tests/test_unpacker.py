@@ -0,0 +1,82 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+from unittest import mock
+
+from tests.httpserver import HTTPServer
+from zztools.utilities import downloader
+from zztools.utilities import unpacker
+from zztools.utilities import unpackmanifest
+
+
+def _targz(files):
+    """Return the bytes of a tar.gz archive of the dict of names and bytes"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class UnpackStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer()
+        self.addCleanup(self.server.close)
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.todir = os.path.join(self.tempdir.name, 'to')
+        patcher = mock.patch.dict(os.environ, \
+                {'XDG_CACHE_HOME': os.path.join(self.tempdir.name, 'cache')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(unpackmanifest, 'enabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.extract = mock.patch.object(unpacker, '_extracttarstream', \
+                wraps=unpacker._extracttarstream).start()
+        self.addCleanup(mock.patch.stopall)
+        self.url = self.server.url('/tool.tar.gz')
+
+    def _unpack(self):
+        with downloader.openurl(self.url) as response:
+            unpacker.unpack_stream(response, self.todir, self.url, \
+                    downloader.responsevalidators(response))
+
+    def _read(self, name):
+        with open(os.path.join(self.todir, name), 'rb') as file:
+            return file.read()
+
+    def test_disabled_manifest_never_skips(self):
+        with mock.patch.object(unpackmanifest, 'enabled', False):
+            self.server.files['/tool.tar.gz'] = _targz({'a': b'a'})
+            self._unpack()
+            self._unpack()
+        self.assertEqual(self.extract.call_count, 2)
+
+    def test_unchanged_stream_is_skipped(self):
+        self.server.files['/tool.tar.gz'] = _targz({'a': b'a', 'b': b'b'})
+        self._unpack()
+        self._unpack()
+        self.assertEqual(self.extract.call_count, 1)
+        self.assertEqual(self._read('a'), b'a')
+
+    def test_changed_member_is_unpacked_again(self):
+        self.server.files['/tool.tar.gz'] = _targz({'a': b'a', 'b': b'b'})
+        self._unpack()
+        os.remove(os.path.join(self.todir, 'b'))
+        self._unpack()
+        self.assertEqual(self.extract.call_count, 2)
+        self.assertEqual(self.extract.call_args[0][3], ['b'])
+        self.assertEqual(self._read('b'), b'b')
+
+    def test_new_version_is_unpacked(self):
+        self.server.files['/tool.tar.gz'] = _targz({'a': b'a'})
+        self._unpack()
+        self.server.files['/tool.tar.gz'] = _targz({'a': b'new'})
+        self._unpack()
+        self.assertEqual(self._read('a'), b'new')
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from zztools.steps.makestep import downloadmakesteps
+from zztools.steps.workspacestep import WorkspaceStep
+from zztools.utilities import workspace
+
+
+class WorkspaceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        patcher = mock.patch.dict(os.environ, \
+                {'XDG_CACHE_HOME': self.tempdir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(workspace, '_used', set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reading_steps_does_not_touch_the_index(self):
+        steps = downloadmakesteps('https://example.com/tool.tar.gz', \
+                use_workspace=True)
+        self.assertIsInstance(steps[0], WorkspaceStep)
+        self.assertEqual(workspace._readindex(), {})
+
+    def test_workspaces_of_the_run_are_not_evicted(self):
+        steps = [WorkspaceStep('https://example.com/{}.tar.gz'.format(index)) \
+                for index in range(workspace.max_count + 4)]
+        for step in steps:
+            os.makedirs(step.path)
+            step.execute()
+        self.assertEqual(len(workspace._readindex()), len(steps))
+        self.assertTrue(all(os.path.isdir(step.path) for step in steps))
+
+    def test_least_recently_used_workspaces_are_evicted(self):
+        old = WorkspaceStep('https://example.com/old.tar.gz')
+        os.makedirs(old.path)
+        old.execute()
+        workspace._used.clear()
+        for index in range(workspace.max_count):
+            WorkspaceStep('https://example.com/{}.tar.gz'.format(index)) \
+                    .execute()
+        self.assertNotIn(os.path.basename(old.path), workspace._readindex())
+        self.assertFalse(os.path.exists(old.path))
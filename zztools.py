@@ -3,13 +3,26 @@ import argparse
 import sys
 import warnings
 
+from git.exc import GitCommandError
+
 from zztools.todolist import TodoList
 from zztools.packagemanager import PackageManager
 from zztools.collection import Collection
+from zztools.installplan import InstallPlan
 from zztools import pseudopackages
-from zztools.exceptions import ConfigValueError, UnsupportedFileTypeError
+from zztools import configfilemanager
+from zztools import memo
+from zztools import journal
+from zztools import scheduler
+from zztools.catalog import Catalog, extensions as catalog_extensions
+from zztools.exceptions import ConfigValueError, UnsupportedFileTypeError, \
+        DownloadError, StepFailedError
 from zztools.utilities import executor
 from zztools.utilities import usertextio
+from zztools.utilities import downloadcache
+from zztools.utilities import unpackmanifest
+from zztools.utilities import git
+from zztools.utilities import maker
 
 
 def _collectionsfromargs(args):
@@ -27,11 +40,16 @@ def _collectionsfromargs(args):
 
 
 def _commandfunctionmapping(key=None):
-    mapping = {None: None, 'execute': execute, 'install': install, 'uninstall': uninstall}
+    mapping = {None: None, 'execute': execute, 'install': install, \
+            'uninstall': uninstall, 'catalog': catalog}
     return mapping[key]
 
 
 def execute(args):
+    if args.memoize or args.force:
+        memo.enabled = True
+    memo.force = args.force
+    scheduler.fail_fast = args.fail_fast
     try:
         todolists = TodoList.multiplefromfile(args.file, args.todolists)
     except (KeyError, FileNotFoundError, UnsupportedFileTypeError, \
@@ -39,12 +57,53 @@ def execute(args):
         errstr = 'Unknown {} while importing the todolist(s)'.format(type(e))
         print('Error: ' + getattr(e, 'message', errstr), file=sys.stderr)
         sys.exit(1)
-    for todolist in todolists:
-        todolist.execute()
+    if args.validate:
+        try:
+            for todolist in todolists:
+                todolist.validate()
+        except (KeyError, FileNotFoundError, UnsupportedFileTypeError, \
+                ConfigValueError) as e:
+            errstr = 'Unknown {} while validating the todolist(s)'.format(type(e))
+            print('Error: ' + getattr(e, 'message', errstr), file=sys.stderr)
+            sys.exit(1)
+        print('The todolist(s) are valid')
+        return
+    try:
+        for index, todolist in enumerate(todolists):
+            journal.assignids(todolist, str(index))
+    except (KeyError, FileNotFoundError, UnsupportedFileTypeError, \
+            ConfigValueError) as e:
+        errstr = 'Unknown {} while importing the todolist(s)'.format(type(e))
+        print('Error: ' + getattr(e, 'message', errstr), file=sys.stderr)
+        sys.exit(1)
+    journal.open_journal([os.path.abspath(args.file)] + args.todolists, \
+            args.resume)
+    complete = False
+    try:
+        for todolist in todolists:
+            try:
+                todolist.execute(args.jobs)
+            except (KeyError, FileNotFoundError, UnsupportedFileTypeError, \
+                    ConfigValueError, DownloadError, StepFailedError) as e:
+                # KeyErrors without a message aren't config errors found while
+                # constructing a step, but bugs
+                if isinstance(e, KeyError) and not hasattr(e, 'message'):
+                    raise
+                errstr = 'Unknown {} while executing the todolist(s)' \
+                        .format(type(e))
+                print('Error: ' + getattr(e, 'message', errstr), \
+                        file=sys.stderr)
+                sys.exit(1)
+            except GitCommandError as e:
+                print('Error: ' + str(e).strip(), file=sys.stderr)
+                sys.exit(1)
+        complete = True
+    finally:
+        journal.close_journal(complete)
+    memo.printreport()
 
 
-def install(args):
-    collections = _collectionsfromargs(args)
+def _planfromargs(args):
     try:
         collections = _collectionsfromargs(args)
     except (KeyError, FileNotFoundError, UnsupportedFileTypeError, \
@@ -52,21 +111,32 @@ def install(args):
         errstr = 'Unknown {} while importing the collection(s)'.format(type(e))
         print('Error: ' + getattr(e, 'message', errstr), file=sys.stderr)
         sys.exit(1)
-    for collection in collections:
-        collection.install()
+    return InstallPlan.fromcollections(collections)
+
+
+def install(args):
+    plan = _planfromargs(args)
+    if args.dry_run:
+        print(plan.describe())
+    else:
+        plan.install()
 
 
 def uninstall(args):
-    collections = _collectionsfromargs(args)
+    plan = _planfromargs(args)
+    if args.dry_run:
+        print(plan.describe())
+    else:
+        plan.uninstall()
+
+def catalog(args):
     try:
-        collections = _collectionsfromargs(args)
-    except (KeyError, FileNotFoundError, UnsupportedFileTypeError, \
-            ConfigValueError) as e:
-        errstr = 'Unknown {} while importing the collection(s)'.format(type(e))
+        Catalog.compile(args.source, args.destination)
+    except (FileNotFoundError, UnsupportedFileTypeError, ConfigValueError) as e:
+        errstr = 'Unknown {} while compiling the catalog'.format(type(e))
         print('Error: ' + getattr(e, 'message', errstr), file=sys.stderr)
         sys.exit(1)
-    for collection in collections:
-        collection.uninstall()
+
 
 def _parser():
     parser = argparse.ArgumentParser('zztools', \
@@ -76,6 +146,54 @@ def _parser():
             action='store_true', \
             help='output to stdout is supressed', \
             dest='quiet')
+    parser.add_argument('-v', '--verbose', \
+            action='store_true', \
+            help='output additional information', \
+            dest='verbose')
+    parser.add_argument('--cache-configs', \
+            action='store_true', \
+            help='cache the parsed config files on disk, so unchanged files ' \
+            'don\'t have to be parsed again in the next run', \
+            dest='cache_configs')
+    parser.add_argument('--sudo-session', \
+            action='store_true', \
+            help='run sudo only once and execute the commands needing it ' \
+            'through one privileged helper process, except the ones which ' \
+            'may ask for input', \
+            dest='sudo_session')
+    parser.add_argument('--download-cache', \
+            action='store_true', \
+            help='keep downloads in a cache and only download them again ' \
+            'if they changed', \
+            dest='download_cache')
+    parser.add_argument('--download-cache-size', \
+            type=int, \
+            default=None, \
+            help='the maximum size of the download cache in MiB', \
+            metavar='MIB', \
+            dest='download_cache_size')
+    parser.add_argument('--unpack-manifests', \
+            action='store_true', \
+            help='record what was unpacked where and skip unpacking archives ' \
+            'again whose destination is unchanged', \
+            dest='unpack_manifests')
+    parser.add_argument('--git-mirrors', \
+            action='store_true', \
+            help='keep local mirrors of git repositories and clone from them', \
+            dest='git_mirrors')
+    parser.add_argument('--git-mirror-dir', \
+            default=None, \
+            help='the directory in which to keep the git mirrors, implies ' \
+            '--git-mirrors', \
+            metavar='DIR', \
+            dest='git_mirror_dir')
+    parser.add_argument('--make-jobs', \
+            type=int, \
+            default=None, \
+            help='the maximum number of make jobs of all builds together, ' \
+            'defaults to the number of cpus', \
+            metavar='N', \
+            dest='make_jobs')
     subparser_action = parser.add_subparsers(title='actions', \
             dest='action', \
             help='')
@@ -89,6 +207,37 @@ def _parser():
             nargs='*', \
             help='specifies the todolists and order which to install', \
             metavar='TODOLIST')
+    parser_action_execute.add_argument('-j', '--jobs', \
+            type=int, \
+            default=None, \
+            help='execute up to JOBS independent steps at the same time', \
+            metavar='JOBS', \
+            dest='jobs')
+    parser_action_execute.add_argument('--memoize', \
+            action='store_true', \
+            help='skip steps whose inputs didn\'t change since they were ' \
+            'last executed successfully', \
+            dest='memoize')
+    parser_action_execute.add_argument('--force', \
+            action='store_true', \
+            help='execute all steps even if their inputs didn\'t change, ' \
+            'implies --memoize', \
+            dest='force')
+    parser_action_execute.add_argument('--resume', \
+            action='store_true', \
+            help='skip the steps which succeeded in the last run of the same ' \
+            'todolists', \
+            dest='resume')
+    parser_action_execute.add_argument('--fail-fast', \
+            action='store_true', \
+            help='stop at the first step whose command fails and terminate ' \
+            'the commands of the steps running at the same time', \
+            dest='fail_fast')
+    parser_action_execute.add_argument('--validate', \
+            action='store_true', \
+            help='only check the todolists and everything they use for ' \
+            'errors, without executing them', \
+            dest='validate')
     packagemanager_sudo_group = parser.add_mutually_exclusive_group()
     packagemanager_sudo_group.add_argument('--sudo', \
             action='store_true', \
@@ -124,12 +273,32 @@ def _parser():
             help='use only the collections given in the list', \
             metavar='COLLECTION', \
             dest='collections')
+    packagemanager_parser.add_argument('-n', '--dry-run', \
+            action='store_true', \
+            help='only show which packages would be passed to which ' \
+            'packagemanager', \
+            dest='dry_run')
     parser_action_install = subparser_action.add_parser('install', \
             description='Installs the given collections', \
             parents=[packagemanager_parser])
     parser_action_uninstall = subparser_action.add_parser('uninstall', \
             description='Uninstalls the given collections', \
             parents=[packagemanager_parser])
+    parser_action_catalog = subparser_action.add_parser('catalog', \
+            description='Manages compiled pseudopackage catalogs')
+    subparser_catalog = parser_action_catalog.add_subparsers(title='actions', \
+            dest='catalog_action', \
+            required=True)
+    parser_catalog_compile = subparser_catalog.add_parser('compile', \
+            description='Compiles a pseudopackage file into a catalog, ' \
+            'which can be given as package file instead of it')
+    parser_catalog_compile.add_argument('source', \
+            help='the pseudopackage file which to compile', \
+            metavar='SOURCE')
+    parser_catalog_compile.add_argument('destination', \
+            help='the path of the catalog, ending in {}'.format(' or '.join( \
+            catalog_extensions)), \
+            metavar='DESTINATION')
     return parser
 
 
@@ -139,6 +308,24 @@ def _handle_general_args(args):
         executor.override_sudo = args.sudo
     if args.quiet:
         usertextio.override_quiet = args.quiet
+    if args.verbose:
+        usertextio.verbose = True
+    if args.cache_configs:
+        configfilemanager.use_disk_cache = True
+    if args.sudo_session:
+        executor.start_sudo_session()
+    if args.download_cache:
+        downloadcache.enabled = True
+    if args.download_cache_size is not None:
+        downloadcache.max_size = args.download_cache_size * 1024 ** 2
+    if args.unpack_manifests:
+        unpackmanifest.enabled = True
+    if args.git_mirrors or args.git_mirror_dir is not None:
+        git.use_mirrors = True
+    if args.git_mirror_dir is not None:
+        git.mirror_dir = args.git_mirror_dir
+    if args.make_jobs is not None:
+        maker.max_jobs = max(1, args.make_jobs)
 
 
 def _main():
@@ -148,7 +335,10 @@ def _main():
     if not function:
         _parser().print_usage(file=sys.stderr)
     else:
-        function(args)
+        try:
+            function(args)
+        finally:
+            executor.stop_sudo_session()
 
 
 def _clean_formatwarning(message, category, filename, lineno, line=None):
@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+
+from zztools import configfilemanager
+from zztools.exceptions import ConfigValueError
+from zztools.utilities import cache
+
+# file extensions of compiled catalogs
+extensions = ('.sqlite', '.db')
+
+# the maximum number of parameters in one sqlite query
+_max_query_parameters = 900
+
+
+class Catalog():
+    """A compiled pseudopackage catalog
+
+    A Catalog is an indexed sqlite database of pseudopackages, compiled from a
+    pseudopackage file. It can be used in place of the pseudopackages imported
+    from such a file, but it only looks up the pseudopackages which are
+    actually used, instead of loading all of them into memory.
+
+    class methods:
+    compile() -- compiles a pseudopackage file into a catalog
+
+    instance methods:
+    get() -- returns the packages of a pseudopackage
+    getmany() -- returns the packages of multiple pseudopackages
+
+    instance variables:
+    path -- the path to the catalog
+    """
+
+    def compile(sourcepath, path):
+        """Compile the pseudopackage file at sourcepath into a catalog at path
+
+        arguments:
+        sourcepath -- the path to the pseudopackage file
+        path -- the path where to write the catalog to
+
+        exceptions:
+        FileNotFoundError -- if the file at the given path is not found
+        UnsupportedFileTypeError -- if the file has the wrong type (extension)
+                                    this error contains an attribute
+                                    \"message\", which contains the
+                                    errormessage and an attribute filename
+                                    which contains the message
+        ConfigValueError -- if a pseudopackage has an invalid value
+                            this error contains an attribute \"message\", which
+                            contains the errormessage
+        """
+        try:
+            pseudopacks = configfilemanager.getconfigfromfile(sourcepath)
+        except FileNotFoundError as e:
+            e.message = 'File with Packages at path {} could not be found'.format(sourcepath)
+            raise
+        rows = []
+        for pseudoname, packages in pseudopacks.items():
+            if not isinstance(packages, dict):
+                message = 'Pseudopackage {} in {} is not a mapping of ' \
+                        'packagemanagers to packages'.format(pseudoname, sourcepath)
+                raise ConfigValueError(message)
+            for pm_name, name in packages.items():
+                rows.append((pseudoname, pm_name, name))
+        temppath = cache.temppath(path)
+        try:
+            connection = sqlite3.connect(temppath)
+            try:
+                connection.execute('CREATE TABLE packages (pseudoname TEXT, ' \
+                        'packagemanager TEXT, name TEXT, ' \
+                        'PRIMARY KEY (pseudoname, packagemanager)) WITHOUT ROWID')
+                connection.executemany('INSERT INTO packages VALUES (?, ?, ?)', \
+                        rows)
+                connection.commit()
+            finally:
+                connection.close()
+            os.replace(temppath, path)
+        except BaseException:
+            try:
+                os.remove(temppath)
+            except OSError:
+                pass
+            raise
+
+    def __init__(self, path):
+        """Constructor
+
+        arguments:
+        path -- the path to the catalog
+
+        exceptions:
+        FileNotFoundError -- if the file at the given path is not found
+        """
+        if not os.path.isfile(path):
+            raise FileNotFoundError(2, 'No such file or directory', path)
+        self.path = path
+        uri = 'file:{}?mode=ro'.format(os.path.abspath(path))
+        self._connection = sqlite3.connect(uri, uri=True, \
+                check_same_thread=False)
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def getmany(self, pseudonames):
+        """Return the packages of the given pseudopackages
+
+        Returns a dict mapping each of the given pseudopackages which is in the
+        catalog to a dict, which maps each packagemanager name to the actual
+        name of the package in that packagemanager. The pseudopackages are
+        looked up in as few queries as possible.
+
+        arguments:
+        pseudonames -- an iterable of the names of the pseudopackages
+        """
+        result = {}
+        missing = dict()
+        for pseudoname in pseudonames:
+            if pseudoname in self._cache:
+                if self._cache[pseudoname] is not None:
+                    result[pseudoname] = self._cache[pseudoname]
+            else:
+                missing[pseudoname] = None
+        missing = list(missing)
+        for start in range(0, len(missing), _max_query_parameters):
+            chunk = missing[start:start + _max_query_parameters]
+            query = 'SELECT pseudoname, packagemanager, name FROM packages ' \
+                    'WHERE pseudoname IN ({})'.format(', '.join('?' * len(chunk)))
+            with self._lock:
+                rows = self._connection.execute(query, chunk).fetchall()
+            found = {}
+            for pseudoname, pm_name, name in rows:
+                found.setdefault(pseudoname, dict())[pm_name] = name
+            for pseudoname in chunk:
+                self._cache[pseudoname] = found.get(pseudoname)
+            result.update(found)
+        return result
+
+    def get(self, pseudoname, default=None):
+        """Return the packages of the given pseudopackage
+
+        Returns a dict mapping each packagemanager name to the actual name of
+        the package in that packagemanager, or default if the pseudopackage is
+        not in the catalog
+
+        arguments:
+        pseudoname -- the name of the pseudopackage
+        default -- what to return if the pseudopackage is not in the catalog
+                   (default None)
+        """
+        return self.getmany([pseudoname]).get(pseudoname, default)
+
+    def __getitem__(self, pseudoname):
+        packages = self.get(pseudoname)
+        if packages is None:
+            raise KeyError(pseudoname)
+        return packages
+
+    def __contains__(self, pseudoname):
+        return self.get(pseudoname) is not None
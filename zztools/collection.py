@@ -3,6 +3,8 @@ import warnings
 from zztools import pseudopackages
 from zztools.packagemanager import PackageManager
 from zztools import configfilemanager
+from zztools import resolver
+from zztools.installplan import InstallPlan
 from zztools.exceptions import ConfigValueError
 
 
@@ -32,6 +34,9 @@ class Collection():
                       pseudoname and the actual name in the packagemanager
     pms_by_name -- a dict mapping each packagemanager name to its corresponding
                    PackageManager object
+    resolver -- the CollectionResolver which resolved this collection, its
+                graph contains all collections resolved together with it, None
+                if the collection wasn't resolved by one
     """
 
     def fromjson(json, pseudopacks, packagemanagers, name=None):
@@ -63,26 +68,7 @@ class Collection():
                 message = 'No name for collection was provided and ' \
                         'there were more than one collection in the file'
                 raise ConfigValueError(message)
-        try:
-            json_collection = json[name]
-        except KeyError as e:
-            e.message = 'Collection {} could not be found'.format(name)
-            raise
-        try:
-            collecticon_packages = json_collection['packages']
-        except KeyError:
-            collecticon_packages = []
-        try:
-            collection_collection_names = json_collection['collections']
-        except KeyError:
-            collection_collection_names = []
-        if collection_collection_names:
-            collection_collections = Collection.multiplefromjson(json, \
-                    pseudopacks, packagemanagers, collection_collection_names)
-        else:
-            collection_collections = []
-        return Collection(name, collection_collections, collecticon_packages, \
-                pseudopacks, packagemanagers)
+        return CollectionResolver(json, pseudopacks, packagemanagers).resolve(name)
 
     def fromfile(path, pseudopacks, packagemanagers, name=None):
         """Returns a TodoList object from the given file
@@ -152,12 +138,11 @@ class Collection():
                             this error contains an attribute \"message\", which
                             contains the errormessage
         """
+        resolver = CollectionResolver(json, pseudopacks, packagemanagers)
         if not names:
-            return [Collection.fromjson(json, pseudopacks, packagemanagers, \
-                    name) for name in json]
+            return [resolver.resolve(name) for name in json]
         else:
-            return [Collection.fromjson(json, pseudopacks, packagemanagers, \
-                    name) for name in names]
+            return [resolver.resolve(name) for name in names]
 
     def multiplefromfile(path, pseudopacks, packagemanagers, names=None):
         """Returns multiple Collection objects from the given file
@@ -219,23 +204,23 @@ class Collection():
                            the order in of which packagemanager to use first
         """
         packages_by_pm = {pm.name : dict() for pm in packagemanagers}
+        resolved = resolver.getresolver(pseudopacks, packagemanagers) \
+                .resolvemany(packages)
         for pseudoname in packages:
-            for pm in packagemanagers:
-                try:
-                    if pm.name in pseudopacks[pseudoname]:
-                        packages_by_pm[pm.name][pseudoname] = pseudopacks[pseudoname][pm.name]
-                        break
-                except KeyError:
-                    message = 'Package {} is not available, skipping'.format(pseudoname)
-                    warnings.warn(message, UserWarning)
-                    break
-            else:
+            if pseudoname not in resolved:
+                message = 'Package {} is not available, skipping'.format(pseudoname)
+                warnings.warn(message, UserWarning)
+            elif resolved[pseudoname] is None:
                 message = 'Package {} has no valid packagemanager, skipping'.format(pseudoname)
                 warnings.warn(message, UserWarning)
+            else:
+                pm_name, realname = resolved[pseudoname]
+                packages_by_pm[pm_name][pseudoname] = realname
         self.name = name
         self.collections = collections
         self.packages_by_pm = packages_by_pm
         self.pms_by_name = {pm.name : pm for pm in packagemanagers}
+        self.resolver = None
 
     def getpackages(self, packagemanager=None):
         """Get the packages of this collection
@@ -255,15 +240,105 @@ class Collection():
             return self.packages_by_pm[packagemanager]
 
     def install(self):
-        """Install all the packages of the collection"""
-        for pm_name in self.packages_by_pm:
-            self.pms_by_name[pm_name].install(list(self.packages_by_pm[pm_name].values()))
-        for collection in self.collections:
-            collection.install()
+        """Install all the packages of the collection
+
+        The packages of this collection and all nested collections are
+        installed with one invocation per packagemanager
+        """
+        InstallPlan.fromcollections([self]).install()
 
     def uninstall(self):
-        """Uninstall all the pakages of the collection"""
-        for pm_name in self.packages_by_pm:
-            self.pms_by_name[pm_name].uninstall(list(self.packages_by_pm[pm_name].values()))
-        for collection in self.collections:
-            collection.install()
+        """Uninstall all the pakages of the collection
+
+        The packages of this collection and all nested collections are
+        uninstalled with one invocation per packagemanager
+        """
+        InstallPlan.fromcollections([self]).uninstall()
+
+
+class CollectionResolver():
+    """Resolves the collections in the json of a collection file
+
+    Every collection is only built once, collections which are nested in
+    multiple other collections share the same Collection object. Collections
+    which contain themselves, directly or through other collections, are
+    detected and reported as an error.
+
+    instance methods:
+    resolve() -- returns the Collection object of a collection
+    getgraph() -- returns the graph of the resolved collections
+
+    instance variables:
+    json -- the json of the whole collection file already imported into python
+    pseudopacks -- the psudopackages as imported directly from json into python
+    packagemanagers -- a list of PackageManager objects which also specify the
+                       order in of which packagemanager to use first
+    collections_by_name -- a dict mapping the name of each resolved collection
+                           to its Collection object
+    """
+
+    def __init__(self, json, pseudopacks, packagemanagers):
+        """Constructor
+
+        arguments:
+        json -- the json of the whole collection file already imported into
+                python
+        pseudopacks -- the psudopackages as imported directly from json into
+                       python
+        packagemanagers -- a list of PackageManager objects which also specify
+                           the order in of which packagemanager to use first
+        """
+        self.json = json
+        self.pseudopacks = pseudopacks
+        self.packagemanagers = packagemanagers
+        self.collections_by_name = {}
+        self._resolving = []
+
+    def resolve(self, name):
+        """Return the Collection object of the collection with the given name
+
+        arguments:
+        name -- the name of the collection in the json
+
+        exceptions:
+        KeyError -- if a needed attribute in the json is not found
+                    this error contains an attribute \"message\", which
+                    contains the errormessage
+        ConfigValueError -- if the collection contains itself, directly or
+                            through other collections
+                            this error contains an attribute \"message\", which
+                            contains the errormessage
+        """
+        if name in self.collections_by_name:
+            return self.collections_by_name[name]
+        if name in self._resolving:
+            circle = self._resolving[self._resolving.index(name):] + [name]
+            message = 'Collections {} form a circle'.format(' -> '.join(circle))
+            raise ConfigValueError(message)
+        try:
+            json_collection = self.json[name]
+        except KeyError as e:
+            e.message = 'Collection {} could not be found'.format(name)
+            raise
+        collecticon_packages = json_collection.get('packages', [])
+        collection_collection_names = json_collection.get('collections', [])
+        self._resolving.append(name)
+        try:
+            collection_collections = [self.resolve(collection_name) \
+                    for collection_name in collection_collection_names]
+        finally:
+            self._resolving.pop()
+        collection = Collection(name, collection_collections, \
+                collecticon_packages, self.pseudopacks, self.packagemanagers)
+        collection.resolver = self
+        self.collections_by_name[name] = collection
+        return collection
+
+    def getgraph(self):
+        """Return the graph of the resolved collections
+
+        Returns a dict mapping the name of each resolved collection to a list
+        of the names of the collections directly nested in it
+        """
+        return {name: [nested.name for nested in collection.collections] \
+                for name, collection in self.collections_by_name.items()}
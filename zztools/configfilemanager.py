@@ -1,51 +1,119 @@
 import json
 import yaml
 import os
+import pickle
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from zztools.exceptions import UnsupportedFileTypeError
+from zztools.utilities import cache
+from zztools.utilities import usertextio
+
+# use the libyaml based loader if pyyaml was built with libyaml
+_yaml_loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# whether to cache the parsed contents of config files on disk
+use_disk_cache = False
+
+# the parsed contents of config files, by absolute path
+_parse_cache = {}
+
+
+def _getdiskcachepath(path):
+    """Return the path of the disk cache file of the config file at path
+
+    arguments:
+    path -- the absolute path to the config file
+    """
+    filename = '{}.pickle'.format(cache.cache_key(path))
+    return os.path.join(cache.cache_dir('configs'), filename)
+
+
+def _readdiskcache(path, mtime, size):
+    """Return the parsed contents of the config file cached on disk
+
+    Returns None if the file isn't cached or changed since it was cached
+
+    arguments:
+    path -- the absolute path to the config file
+    mtime -- the modification time of the config file in nanoseconds
+    size -- the size of the config file in bytes
+    """
+    try:
+        with open(_getdiskcachepath(path), 'rb') as file:
+            cached_mtime, cached_size, config = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+        return None
+    if (cached_mtime, cached_size) != (mtime, size):
+        return None
+    return config
+
+
+def _writediskcache(path, mtime, size, config):
+    """Cache the parsed contents of the config file on disk
+
+    arguments:
+    path -- the absolute path to the config file
+    mtime -- the modification time of the config file in nanoseconds
+    size -- the size of the config file in bytes
+    config -- the parsed contents of the config file
+    """
+    try:
+        with cache.atomic_write(_getdiskcachepath(path), binary=True) as file:
+            pickle.dump((mtime, size, config), file, pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
 
 
 def _getconfigfromjsonfile(path):
     """Returns the imported contents of the given json file
 
+    If orjson is installed, it is used instead of the json module
+
     arguments:
     path -- path to the json file
 
     exceptions:
     FileNotFoundError -- if the file at the given path is not found
     """
-    with open(path) as file:
-        return json.load(file)
+    with open(path, 'rb') as file:
+        content = file.read()
+    if orjson is not None:
+        usertextio.print_verbose('Parsing {} with orjson'.format(path))
+        return orjson.loads(content)
+    usertextio.print_verbose('Parsing {} with json'.format(path))
+    return json.loads(content)
 
 
 def _getconfigfromyamlfile(path):
     """Returns the imported contents of the given yaml file
 
+    If pyyaml was built with libyaml, its C loader is used
+
     arguments:
     path -- path to the yaml file
 
     exceptions:
     FileNotFoundError -- if the file at the given path is not found
     """
-    with open(path) as file:
-        return yaml.safe_load(file)
+    usertextio.print_verbose('Parsing {} with {}'.format(path, \
+            _yaml_loader.__name__))
+    with open(path, 'rb') as file:
+        return yaml.load(file, Loader=_yaml_loader)
 
 
-def getconfigfromfile(path):
+def _parseconfigfile(path):
     """Returns a json type object from the file at the given path
 
-    Reads and converts the file at the given path to a json type object in
-    python. Currently only json and yaml filetypes are supported
-
     arguments:
     path -- path to the file
 
     exceptions:
     FileNotFoundError -- if the file at the given path is not found
     UnsupportedFileTypeError -- if the file has the wrong type (extension)
-                                this error contains an attribute \"message\",
-                                which contains the errormessage and an
-                                attribute filename which contains the message
     """
     filetype = os.path.splitext(path)[1]
     if filetype == '.json':
@@ -58,3 +126,43 @@ def getconfigfromfile(path):
         else:
             message = 'Filetype {} of file {} not supported'.format(filetype, path)
         raise UnsupportedFileTypeError(message, path)
+
+
+def getconfigfromfile(path):
+    """Returns a json type object from the file at the given path
+
+    Reads and converts the file at the given path to a json type object in
+    python. Currently only json and yaml filetypes are supported.
+    Every file is only parsed once per run as long as its modification time and
+    size stay the same, if use_disk_cache is set, the parsed contents are also
+    cached on disk between runs. The returned object is shared between all
+    callers, so it must not be modified.
+
+    arguments:
+    path -- path to the file
+
+    exceptions:
+    FileNotFoundError -- if the file at the given path is not found
+    UnsupportedFileTypeError -- if the file has the wrong type (extension)
+                                this error contains an attribute \"message\",
+                                which contains the errormessage and an
+                                attribute filename which contains the message
+    """
+    abspath = os.path.abspath(os.path.expanduser(path))
+    try:
+        stat = os.stat(abspath)
+    except FileNotFoundError:
+        return _parseconfigfile(path)
+    mtime, size = stat.st_mtime_ns, stat.st_size
+    cached = _parse_cache.get(abspath)
+    if cached is not None and cached[:2] == (mtime, size):
+        return cached[2]
+    config = None
+    if use_disk_cache:
+        config = _readdiskcache(abspath, mtime, size)
+    if config is None:
+        config = _parseconfigfile(path)
+        if use_disk_cache:
+            _writediskcache(abspath, mtime, size, config)
+    _parse_cache[abspath] = (mtime, size, config)
+    return config
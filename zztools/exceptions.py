@@ -41,3 +41,71 @@ class ConfigValueError(ValueError):
         """
         self.args = [message]
         self.message = message
+
+
+class SudoSessionError(OSError):
+    """If the privileged helper of a sudo session can't be used
+
+    Raised if the helper couldn't be started or stopped working. In that case
+    commands should be executed with sudo directly instead, unless the command
+    was already sent to the helper, since it may have been executed then.
+
+    instance variables:
+    args -- the arguments in order
+    message -- the errormessage
+    sent -- whether the command was already sent to the helper
+    """
+
+    def __init__(self, message, sent=False):
+        """Constructor
+
+        arguments:
+        message -- the errormessage
+        sent -- whether the command was already sent to the helper
+                (default False)
+        """
+        self.args = [message, sent]
+        self.message = message
+        self.sent = sent
+
+
+class DownloadError(OSError):
+    """If a download failed
+
+    instance variables:
+    args -- the arguments in order
+    message -- the errormessage
+    url -- the url which could not be downloaded
+    """
+
+    def __init__(self, message, url):
+        """Constructor
+
+        arguments:
+        message -- the errormessage
+        url -- the url which could not be downloaded
+        """
+        self.args = [message, url]
+        self.message = message
+        self.url = url
+
+
+class StepFailedError(RuntimeError):
+    """If a step failed and the todolist is executed with fail-fast
+
+    instance variables:
+    args -- the arguments in order
+    message -- the errormessage
+    step -- the step which failed
+    """
+
+    def __init__(self, message, step):
+        """Constructor
+
+        arguments:
+        message -- the errormessage
+        step -- the step which failed
+        """
+        self.args = [message, step]
+        self.message = message
+        self.step = step
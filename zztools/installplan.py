@@ -0,0 +1,210 @@
+import concurrent.futures
+
+from zztools.utilities import executor
+
+
+def _printskipped(pm_name, count, reason):
+    """Print how many packages of a packagemanager are skipped
+
+    arguments:
+    pm_name -- the name of the packagemanager
+    count -- the number of skipped packages
+    reason -- why the packages are skipped, e.g. \"installed\"
+    """
+    if count:
+        print('Skipping {} {} packages of {}'.format(count, reason, pm_name))
+
+
+class InstallPlan():
+    """The packages of one or more collections, merged by packagemanager
+
+    An InstallPlan flattens collections and all of their nested collections
+    into one deduplicated list of packages per packagemanager, so each
+    packagemanager only has to be invoked once.
+
+    class methods:
+    fromcollections() -- returns an InstallPlan object from collections
+
+    Packagemanagers in different lock groups are run at the same time, the
+    ones sharing a lock group one after another. Lock groups containing an
+    interactive packagemanager are not run at the same time as others.
+
+    instance methods:
+    getlockgroups() -- returns the packagemanagers grouped by lock group
+    describe() -- returns a description of the plan
+    install() -- install all packages of the plan which are not installed
+    uninstall() -- uninstall all packages of the plan which are installed
+
+    instance variables:
+    packages_by_pm -- a dict mapping each packagemanager name to a list of the
+                      actual names of the packages in the packagemanager
+    pms_by_name -- a dict mapping each packagemanager name to its corresponding
+                   PackageManager object
+    """
+
+    def fromcollections(collections):
+        """Returns an InstallPlan object from the given collections
+
+        Each collection is only visited once, even if it is nested in multiple
+        other collections.
+
+        arguments:
+        collections -- a list of Collection objects
+        """
+        packages_by_pm = {}
+        pms_by_name = {}
+        visited = set()
+        stack = list(reversed(collections))
+        while stack:
+            collection = stack.pop()
+            if id(collection) in visited:
+                continue
+            visited.add(id(collection))
+            for pm_name, packages in collection.packages_by_pm.items():
+                pms_by_name.setdefault(pm_name, collection.pms_by_name[pm_name])
+                planned = packages_by_pm.setdefault(pm_name, dict())
+                for package in packages.values():
+                    planned[package] = None
+            stack.extend(reversed(collection.collections))
+        packages_by_pm = {pm_name: list(packages) for pm_name, packages \
+                in packages_by_pm.items() if packages}
+        return InstallPlan(packages_by_pm, pms_by_name)
+
+    def __init__(self, packages_by_pm, pms_by_name):
+        """Constructor
+
+        arguments:
+        packages_by_pm -- a dict mapping each packagemanager name to a list of
+                          the actual names of the packages in the
+                          packagemanager
+        pms_by_name -- a dict mapping each packagemanager name to its
+                       corresponding PackageManager object
+        """
+        self.packages_by_pm = packages_by_pm
+        self.pms_by_name = pms_by_name
+
+    def describe(self):
+        """Return a description of the plan as a string
+
+        The description contains one line per packagemanager, listing the
+        packages which would be passed to it.
+        """
+        if not self.packages_by_pm:
+            return 'Nothing to do'
+        lines = []
+        for pm_name, packages in self.packages_by_pm.items():
+            lines.append('{} ({} packages): {}'.format(pm_name, len(packages), \
+                    ' '.join(packages)))
+        return '\n'.join(lines)
+
+    def getlockgroups(self):
+        """Return the packagemanagers of the plan grouped by their lock group
+
+        Returns a list of lists of packagemanager names, the packagemanagers
+        in each list share a lock group. All packagemanagers without a lock
+        group are in the same list. The order of the plan is kept.
+        """
+        groups = {}
+        for pm_name in self.packages_by_pm:
+            lock_group = self.pms_by_name[pm_name].lock_group
+            groups.setdefault(lock_group, []).append(pm_name)
+        return list(groups.values())
+
+    def _usessudo(self, pm_name, override_sudo=None):
+        """Return whether the packagemanager runs its commands with sudo
+
+        arguments:
+        pm_name -- the name of the packagemanager
+        override_sudo -- if None, it doesnt override the sudo setting of the
+                         packagemanager (default None)
+        """
+        if executor.is_sudo_overridden():
+            return executor.override_sudo
+        if override_sudo is not None:
+            return override_sudo
+        return self.pms_by_name[pm_name].sudo
+
+    def _run(self, function, override_sudo=None):
+        """Call function with each packagemanager name of the plan
+
+        The packagemanagers of each lock group are passed one after another.
+        Lock groups containing an interactive packagemanager are handled first,
+        one after another, so their commands can ask for input. The other lock
+        groups are handled at the same time afterwards, the output of each of
+        their packagemanagers is prefixed with its name and their commands
+        can't ask for input. If any of them uses sudo, the sudo password is
+        asked for once beforehand, if that fails, they are handled one after
+        another as well.
+
+        arguments:
+        function -- a function taking a packagemanager name and the prefix for
+                    its output
+        override_sudo -- if None, it doesnt override the sudo setting of the
+                         packagemanagers (default None)
+        """
+        groups = self.getlockgroups()
+        parallel = [group for group in groups if not any( \
+                self.pms_by_name[pm_name].interactive for pm_name in group)]
+        if len(parallel) > 1 and any(self._usessudo(pm_name, override_sudo) \
+                for group in parallel for pm_name in group) \
+                and not executor.validate_sudo():
+            parallel = []
+        if len(parallel) <= 1:
+            parallel = []
+        for group in groups:
+            if group not in parallel:
+                for pm_name in group:
+                    function(pm_name, None)
+        if not parallel:
+            return
+
+        def rungroup(group):
+            for pm_name in group:
+                function(pm_name, pm_name)
+
+        with concurrent.futures.ThreadPoolExecutor(len(parallel)) as pool:
+            futures = [pool.submit(rungroup, group) for group in parallel]
+        for future in futures:
+            future.result()
+
+    def install(self, override_sudo=None):
+        """Install all packages of the plan, once per packagemanager
+
+        Packages which the packagemanager reports as installed are skipped.
+        Packagemanagers in different lock groups install at the same time,
+        unless they are interactive.
+
+        arguments:
+        override_sudo -- if None, it doesnt override the sudo setting of the
+                         packagemanagers, if true or false, it uses/doesnt use
+                         sudo accordingly (default None)
+        """
+        def install(pm_name, prefix):
+            packages = self.packages_by_pm[pm_name]
+            pm = self.pms_by_name[pm_name]
+            missing = pm.filtermissing(packages)
+            _printskipped(pm_name, len(packages) - len(missing), 'installed')
+            pm.install(missing, override_sudo, prefix)
+
+        self._run(install, override_sudo)
+
+    def uninstall(self, override_sudo=None):
+        """Uninstall all packages of the plan, once per packagemanager
+
+        Packages which the packagemanager reports as not installed are skipped.
+        Packagemanagers in different lock groups uninstall at the same time,
+        unless they are interactive.
+
+        arguments:
+        override_sudo -- if None, it doesnt override the sudo setting of the
+                         packagemanagers, if true or false, it uses/doesnt use
+                         sudo accordingly (default None)
+        """
+        def uninstall(pm_name, prefix):
+            packages = self.packages_by_pm[pm_name]
+            pm = self.pms_by_name[pm_name]
+            installed = pm.filterinstalled(packages)
+            _printskipped(pm_name, len(packages) - len(installed), 'not installed')
+            pm.uninstall(installed, override_sudo, prefix)
+
+        self._run(uninstall, override_sudo)
@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import hashlib
+import warnings
+import threading
+
+import zztools.steps.lazystep as lazystep_mod
+import zztools.steps.liststep as liststep_mod
+from zztools import memo
+from zztools.utilities import cache
+from zztools.utilities import usertextio
+
+# the number of records after which the journal is synced to disk
+batch_size = 32
+
+# the time in seconds after which pending records are synced to disk
+batch_interval = 1.0
+
+# instance attributes of steps which change when executing them, so they are
+# not part of their identity
+_volatile_attributes = ('changed', 'returncode', 'result', 'stepid')
+
+_journal = None
+
+
+def _identify(value):
+    """Return a json serializable stand-in for an attribute value of a step
+
+    A todolist is represented by the ids of its steps, other objects by their
+    name or type.
+    """
+    if isinstance(getattr(value, 'steps', None), (list, tuple)):
+        return [step.stepid for step in value.steps]
+    return getattr(value, 'name', None) or type(value).__name__
+
+
+def getstepid(step, position):
+    """Return the stable identity of the step
+
+    The identity consists of the position of the step, or its name if it has
+    one, its type and a hash of its attributes, so it stays the same between
+    runs of an unchanged todolist and changes if the step is edited.
+
+    arguments:
+    step -- the step which to identify
+    position -- a string of the position of the step in the todolists
+    """
+    attributes = {name: value for name, value in vars(step).items() \
+            if name not in _volatile_attributes and not name.startswith('_')}
+    content = json.dumps([type(step).__name__, attributes], sort_keys=True, \
+            default=_identify)
+    digest = hashlib.sha256(content.encode()).hexdigest()[:16]
+    if step.name is not None:
+        position = '{}@{}'.format(position.rsplit('/', 1)[0], step.name)
+    return '{}:{}:{}'.format(position, type(step).__name__, digest)
+
+
+def assignids(todolist, prefix):
+    """Set the stepid attribute of all steps of the todolist
+
+    The steps of nested ListSteps get ids as well, before the ListSteps
+    themselves, so the id of a ListStep changes with the ones of its steps.
+    Lazy list steps are constructed for that, they get the id of the
+    constructed ListStep, so editing the nested todolist changes it as well.
+
+    arguments:
+    todolist -- the todolist whose steps to identify
+    prefix -- a string identifying the todolist
+
+    exceptions:
+    FileNotFoundError -- if the file of a nested todolist is not found
+                         this error contains an attribute \"message\", which
+                         contains the errormessage
+    KeyError -- if a needed attribute in the json of a list step is not found
+                this error contains an attribute \"message\", which
+                contains the errormessage
+    ConfigValueError -- if some attribute of a list step has an invalid value
+                        this error contains an attribute \"message\", which
+                        contains the errormessage
+    """
+    for index, step in enumerate(todolist.steps):
+        position = '{}/{}'.format(prefix, index)
+        resolved = step
+        if isinstance(step, lazystep_mod.LazyStep) and step.type == 'list':
+            resolved = step.resolve()
+        if isinstance(resolved, liststep_mod.ListStep):
+            assignids(resolved.todolist, position)
+        step.stepid = resolved.stepid = getstepid(resolved, position)
+
+
+class Journal():
+    """An append-only record of the steps executed in a run
+
+    Every step is recorded when it starts and when it finishes, together with
+    its result. Records are written immediately, but synced to disk in
+    batches, except for failures, which are synced right away. If the journal
+    can't be written, a warning is shown and the run continues without it.
+
+    instance methods:
+    record() -- appends a record
+    getsucceeded() -- returns the ids of the steps which succeeded
+    close() -- syncs and closes the journal
+
+    instance variables:
+    path -- the path of the journal file
+    """
+
+    def __init__(self, path, resume=False):
+        """Constructor
+
+        arguments:
+        path -- the path of the journal file
+        resume -- whether to keep the records of the last run, otherwise the
+                  journal is started anew (default False)
+        """
+        self.path = path
+        self._succeeded = set()
+        if resume:
+            self._succeeded = Journal._readsucceeded(path)
+        self._file = open(path, 'a' if resume else 'w')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._lastsync = time.monotonic()
+        self._failed = False
+
+    @staticmethod
+    def _readsucceeded(path):
+        """Return the ids of the steps which succeeded in the journal at path
+
+        A step succeeded if its last finish record has the result ok or
+        skipped. Incomplete last lines of an interrupted run are ignored.
+
+        arguments:
+        path -- the path of the journal file
+        """
+        results = {}
+        try:
+            with open(path) as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get('event') == 'finish':
+                        results[entry['step']] = entry['result']
+        except OSError:
+            pass
+        return {stepid for stepid, result in results.items() \
+                if result in ('ok', 'skipped')}
+
+    def getsucceeded(self):
+        """Return the set of ids of the steps which succeeded before"""
+        return self._succeeded
+
+    def record(self, event, stepid, result=None):
+        """Append a record to the journal
+
+        arguments:
+        event -- either start or finish
+        stepid -- the id of the step
+        result -- the result of a finished step, ok, failed or skipped
+                  (default None)
+        """
+        entry = {'event': event, 'step': stepid, 'time': time.time()}
+        if result is not None:
+            entry['result'] = result
+        with self._lock:
+            if result == 'failed':
+                self._failed = True
+            if self._file is None:
+                return
+            try:
+                self._file.write(json.dumps(entry) + '\n')
+                self._pending += 1
+                if result == 'failed' or self._pending >= batch_size \
+                        or time.monotonic() - self._lastsync >= batch_interval:
+                    self._sync()
+            except OSError as e:
+                self._abandon(e)
+
+    def _sync(self):
+        """Flush the journal and sync it to disk"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._lastsync = time.monotonic()
+
+    def _abandon(self, error):
+        """Warn about the error and stop writing the journal
+
+        arguments:
+        error -- the OSError raised while writing the journal
+        """
+        message = 'Could not write the journal {}: {}, continuing without ' \
+                'it'.format(self.path, error.strerror or error)
+        warnings.warn(message, UserWarning)
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        self._file = None
+
+    def close(self, complete=False):
+        """Sync and close the journal
+
+        arguments:
+        complete -- whether the run finished, then the journal is truncated if
+                    no step failed, so resuming the next run doesn't skip any
+                    step (default False)
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                if complete and not self._failed:
+                    self._file.truncate(0)
+                self._sync()
+                self._file.close()
+            except OSError as e:
+                self._abandon(e)
+
+
+def open_journal(key, resume=False):
+    """Start the journal of the run identified by the key
+
+    arguments:
+    key -- a list of strings identifying the run, like the path of the file
+           and the names of the todolists
+    resume -- whether steps which succeeded in the last run with the same key
+              are skipped (default False)
+    """
+    global _journal
+    try:
+        path = os.path.join(cache.cache_dir('journal'), \
+                cache.cache_key(*key) + '.jsonl')
+        _journal = Journal(path, resume)
+    except OSError as e:
+        message = 'Could not open the journal: {}, continuing without ' \
+                'it'.format(e)
+        warnings.warn(message, UserWarning)
+        _journal = None
+
+
+def close_journal(complete=False):
+    """Close the journal of the run, if one is open
+
+    arguments:
+    complete -- whether the run finished, then the journal is emptied if no
+                step failed, so a later resumed run starts from the beginning
+                (default False)
+    """
+    global _journal
+    if _journal is not None:
+        _journal.close(complete)
+        _journal = None
+
+
+def execute(step):
+    """Execute the step, recording it in the journal of the run
+
+    If the journal is resumed and the step succeeded in the last run, it is
+    skipped. Whether it changed something is unknown then, so steps depending
+    on it through if_changed are executed. Steps without a stepid and steps
+    executed without an open journal are just executed.
+
+    arguments:
+    step -- the step which to execute
+    """
+    journal = _journal
+    if journal is None or step.stepid is None:
+        memo.execute(step)
+        return
+    if step.stepid in journal.getsucceeded():
+        usertextio.print_verbose('Skipping {}, it succeeded in the last ' \
+                'run'.format(step.stepid))
+        journal.record('finish', step.stepid, 'skipped')
+        return
+    journal.record('start', step.stepid)
+    try:
+        memo.execute(step)
+    except BaseException:
+        journal.record('finish', step.stepid, 'failed')
+        raise
+    result = 'ok' if step.returncode in (None, 0) else 'failed'
+    journal.record('finish', step.stepid, result)
@@ -0,0 +1,196 @@
+import os
+import json
+import stat
+import time
+import hashlib
+
+from zztools.utilities import cache
+from zztools.utilities import usertextio
+
+# whether steps whose inputs didn't change since their last successful
+# execution are skipped
+enabled = False
+
+# whether memoizable steps are executed even if their inputs didn't change,
+# their records are still updated
+force = False
+
+# a list of tuples of the description of each skipped step and the reason
+report = []
+
+# names of directories which are left out of tree fingerprints
+_ignored_dirs = ('.git',)
+
+
+def treefingerprint(path):
+    """Return a fingerprint of the directory tree at path
+
+    The fingerprint covers the relative path, size and modification time of
+    every file and link in the tree, but not their contents, so it changes
+    whenever a file is added, removed or written. Returns None if path
+    doesn't exist.
+
+    arguments:
+    path -- the path of the directory or file
+    """
+    path = os.path.expanduser(path)
+    if not os.path.lexists(path):
+        return None
+    digest = hashlib.sha256()
+    if not os.path.isdir(path):
+        result = os.lstat(path)
+        digest.update('{}\0{}'.format(result.st_size, result.st_mtime_ns) \
+                .encode())
+        return digest.hexdigest()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(name for name in dirs if name not in _ignored_dirs)
+        for name in sorted(files):
+            filepath = os.path.join(root, name)
+            try:
+                result = os.lstat(filepath)
+            except OSError:
+                continue
+            digest.update('{}\0{}\0{}\n'.format(os.path.relpath(filepath, \
+                    path), result.st_size, result.st_mtime_ns).encode())
+    return digest.hexdigest()
+
+
+def pathsfingerprint(paths):
+    """Return a fingerprint of the files at the given paths
+
+    Like treefingerprint(), but only the given paths are looked at, so files
+    next to them don't change the fingerprint. Directories only count by their
+    existence, their contents aren't walked.
+
+    arguments:
+    paths -- a list of the paths of the files
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            result = os.lstat(path)
+        except OSError:
+            digest.update('{}\0missing\n'.format(path).encode())
+            continue
+        if stat.S_ISDIR(result.st_mode):
+            digest.update('{}\0d\n'.format(path).encode())
+        else:
+            digest.update('{}\0{}\0{}\n'.format(path, result.st_size, \
+                    result.st_mtime_ns).encode())
+    return digest.hexdigest()
+
+
+def _getrecordpath(key):
+    """Return the path of the record of the step with the given memo key
+
+    arguments:
+    key -- the memo key of the step
+    """
+    return os.path.join(cache.cache_dir('memo'), \
+            cache.cache_key(*[str(part) for part in key]) + '.json')
+
+
+def _hashinputs(inputs):
+    """Return the sha256 hash of the json serializable inputs of a step"""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()) \
+            .hexdigest()
+
+
+def _getoutputs(step):
+    """Return the list of the paths written by the step"""
+    paths = step.getpaths()
+    if paths is None:
+        return []
+    return [os.path.abspath(os.path.expanduser(path)) for path in paths[1]]
+
+
+def _describe(step, key):
+    """Return a short description of the step for messages
+
+    arguments:
+    step -- the step which to describe
+    key -- the memo key of the step
+    """
+    if step.name is not None:
+        return step.name
+    return ' '.join(str(part) for part in key[:2])
+
+
+def _whyexecute(record, inputs):
+    """Return why a step with the record and inputs has to be executed
+
+    Returns None if the step can be skipped.
+
+    arguments:
+    record -- the record of the last successful execution, can be None
+    inputs -- the current inputs of the step, can be None
+    """
+    if inputs is None:
+        return 'its inputs are unknown'
+    if record is None:
+        return 'it was not executed before'
+    if record['inputs'] != _hashinputs(inputs):
+        return 'its inputs changed'
+    for path in record['outputs']:
+        if not os.path.lexists(path):
+            return 'its output {} is missing'.format(path)
+    if record.get('written') is not None \
+            and pathsfingerprint(record['written']) != record['fingerprint']:
+        return 'the files it wrote changed'
+    return None
+
+
+def execute(step):
+    """Execute the step unless its inputs didn't change since the last time
+
+    If memoization is enabled and the step has a memo key, it is skipped if
+    its inputs are the same as after its last successful execution, its
+    outputs still exist and the files it wrote, if it reports them, are
+    unchanged. Skipped steps are added to the report and count as
+    not changed. After a successful execution the inputs are recorded again,
+    steps which executed a command with a nonzero returncode aren't recorded.
+
+    arguments:
+    step -- the step which to execute
+    """
+    key = step.getmemokey() if enabled and step.memoize else None
+    if key is None:
+        step.execute()
+        return
+    description = _describe(step, key)
+    path = _getrecordpath(key)
+    record = cache.readjson(path)
+    reason = _whyexecute(record, step.getinputs())
+    if reason is None and not force:
+        reason = 'its inputs are unchanged since {}'.format(time.strftime( \
+                '%Y-%m-%d %H:%M', time.localtime(record['time'])))
+        usertextio.print_verbose('Skipping {}, {}'.format(description, reason))
+        report.append((description, reason))
+        step.changed = False
+        return
+    if reason is None:
+        reason = 'it is forced'
+    usertextio.print_verbose('Executing {}, {}'.format(description, reason))
+    step.execute()
+    if step.returncode not in (None, 0):
+        if record is not None:
+            os.remove(path)
+        return
+    inputs = step.getinputs()
+    if inputs is not None:
+        record = {'key': [str(part) for part in key], \
+                'inputs': _hashinputs(inputs), 'outputs': _getoutputs(step), \
+                'written': step.getwritten(), 'time': time.time()}
+        if record['written'] is not None:
+            record['fingerprint'] = pathsfingerprint(record['written'])
+        cache.writejson(path, record)
+
+
+def printreport():
+    """Print which steps were skipped and why"""
+    if not report:
+        return
+    print('Skipped {} step{}:'.format(len(report), '' if len(report) == 1 \
+            else 's'))
+    for description, reason in report:
+        print('  {}: {}'.format(description, reason))
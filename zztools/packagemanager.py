@@ -1,6 +1,44 @@
+import os
+import warnings
+
 from zztools import configfilemanager
 from zztools.exceptions import ConfigValueError
 from zztools.utilities import executor
+from zztools.utilities import cache
+from zztools.utilities import usertextio
+
+# the installed packages of each packagemanager, by packagemanager name
+_installed_cache = {}
+
+# the space in bytes to leave free when filling the argument list of a command
+_arg_margin = 4096
+
+# the space in bytes a pointer takes up in the argument list of a command
+_arg_pointer_size = 8
+
+
+def _getargmax():
+    """Return the number of bytes which can be used for command arguments
+
+    This is the argument limit of the system, minus the space taken up by the
+    environment and a margin
+    """
+    try:
+        argmax = os.sysconf('SC_ARG_MAX')
+    except (ValueError, OSError):
+        argmax = 131072
+    environment = sum(len(key) + len(value) + 2 + _arg_pointer_size \
+            for key, value in os.environ.items())
+    return argmax - environment - _arg_margin
+
+
+def _getarglength(args):
+    """Return the number of bytes the given arguments take up
+
+    arguments:
+    args -- a list of the arguments as strings
+    """
+    return sum(len(arg.encode()) + 1 + _arg_pointer_size for arg in args)
 
 
 class PackageManager():
@@ -9,6 +47,12 @@ class PackageManager():
     This class provides an interface to a real world packagemanager like dnf
     or apt.
 
+    If a packagemanager has a query command in its config, its installed
+    packages are only queried once per run and kept in memory. They are only
+    cached on disk between runs if it also has a database in its config,
+    whose modification time tells when the cache is outdated, for other
+    packagemanagers the query command is executed once in every run.
+
     class methods:
     fromjson() -- Returns a PackageManager object from json
     fromfile() -- Returns a PackageManager object from a file
@@ -17,6 +61,9 @@ class PackageManager():
 
     instance methods:
     _executecommand() -- executes a command
+    getinstalled() -- Returns the installed packages
+    filtermissing() -- Returns the given packages which are not installed
+    filterinstalled() -- Returns the given packages which are installed
     install() -- Installs the given packages
     uninstall() -- Uninstalls the given packages
 
@@ -25,6 +72,16 @@ class PackageManager():
     command -- the base command of the packagemanager
     install_command -- the install command of the packagemanager
     uninstall_command -- the uninstall command of the packagemanager
+    query_command -- the command listing the installed packages, can be None
+    database -- the path to the database of the packagemanager, can be None
+    max_batch -- the maximum number of packages passed to one command, can be
+                 None
+    lock_group -- the name of the lock the packagemanager uses, packagemanagers
+                  with different lock groups can run at the same time, can be
+                  None
+    interactive -- whether the commands of the packagemanager may ask for
+                   input, interactive packagemanagers never run at the same
+                   time as others
     accept -- the accept part of the packagemanager command
     sudo -- whether to put sudo in front of the command or not
     """
@@ -66,7 +123,22 @@ class PackageManager():
         except KeyError as e:
             e.message = 'Attribute {} of packagemanager {} could not pe found'.format(e.args[0], name)
             raise
-        return PackageManager(name, install_command, uninstall_command,  sudo)
+        query_command = json_pm.get('query', json_pm.get('list_installed', None))
+        database = json_pm.get('database', None)
+        max_batch = json_pm.get('max_batch', None)
+        if max_batch is not None and (not isinstance(max_batch, int) \
+                or isinstance(max_batch, bool) or max_batch < 1):
+            message = 'Attribute max_batch of packagemanager {} has to be a ' \
+                    'positive integer'.format(name)
+            raise ConfigValueError(message)
+        lock_group = json_pm.get('lock_group', None)
+        interactive = json_pm.get('interactive', True)
+        if not isinstance(interactive, bool):
+            message = 'Attribute interactive of packagemanager {} has to be ' \
+                    'true or false'.format(name)
+            raise ConfigValueError(message)
+        return PackageManager(name, install_command, uninstall_command,  sudo, \
+                query_command, database, max_batch, lock_group, interactive)
 
     def fromfile(path, name=None):
         """Returns a TodoList object from the given file
@@ -173,7 +245,9 @@ class PackageManager():
             raise
         return packagemanagers
 
-    def __init__(self, name, install_command, uninstall_command, sudo):
+    def __init__(self, name, install_command, uninstall_command, sudo, \
+            query_command=None, database=None, max_batch=None, lock_group=None, \
+            interactive=True):
         """Constructor
 
         arguments:
@@ -181,13 +255,33 @@ class PackageManager():
         install_command -- the install command of the packagemanager
         uninstall_command -- the uninstall command of the packagemanager
         sudo -- whether to put sudo in front of the command or not
+        query_command -- the command which lists the installed packages, one
+                         per line, anything after the first whitespace of a
+                         line is ignored (default None)
+        database -- the path to the database of the packagemanager, its
+                    modification time decides whether the installed packages
+                    cached on disk are still valid (default None)
+        max_batch -- the maximum number of packages to pass to one command,
+                     if None, as many as the argument limit of the system
+                     allows are passed (default None)
+        lock_group -- the name of the lock the packagemanager uses, all
+                      packagemanagers without a lock group share one
+                      (default None)
+        interactive -- whether the commands of the packagemanager may ask for
+                       input, e.g. for a confirmation, if so, it never runs at
+                       the same time as other packagemanagers (default True)
         """
         self.name = name
         self.install_command = install_command
         self.uninstall_command = uninstall_command
         self.sudo = sudo
+        self.query_command = query_command
+        self.database = database
+        self.max_batch = max_batch
+        self.lock_group = lock_group
+        self.interactive = interactive
 
-    def _executecommand(self, command, override_sudo=None):
+    def _executecommand(self, command, override_sudo=None, prefix=None):
         """Executes the given command with the proper sudo setting
 
         arguments:
@@ -196,37 +290,246 @@ class PackageManager():
         override_sudo -- if None, it doesnt override the sudo setting in the
                          class, if true or false, it uses/doesnt use sudo
                          accordingly (default None)
+        prefix -- if given, each line of the output of the commands is
+                  prefixed with it (default None)
         """
         if override_sudo is None:
             sudo =self.sudo
         else:
             sudo = override_sudo
-        executor.execute_command(command, sudo=sudo)
+        return executor.execute_command(command, sudo=sudo, prefix=prefix, \
+                interactive=self.interactive)
+
+    def _batch(self, command, packages):
+        """Split the given packages into batches which fit into one command
+
+        Each batch contains at most max_batch packages and fits into the
+        argument limit of the system together with the command.
+
+        arguments:
+        command -- the command to which the packages are appended
+        packages -- a list of the packages as strings
+        """
+        available = _getargmax() - _getarglength(['sudo'] + command.split(' '))
+        batches = []
+        batch = []
+        length = 0
+        for package in packages:
+            packagelength = _getarglength([package])
+            if batch and (length + packagelength > available \
+                    or len(batch) == self.max_batch):
+                batches.append(batch)
+                batch = []
+                length = 0
+            batch.append(package)
+            length += packagelength
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _executebisecting(self, command, packages, override_sudo=None, \
+            prefix=None, returncode=None):
+        """Execute the command with the packages, bisecting on failure
+
+        If the command fails, the packages are split in half and the command
+        is executed with each half, until the packages with which it fails are
+        isolated. Returns a list of those packages. Each failing half is
+        bisected further, since the returncode doesn't tell failing packages
+        apart from other failures, like a held lock.
+
+        arguments:
+        command -- the command to which the packages are appended
+        packages -- a list of the packages as strings
+        override_sudo -- if None, it doesnt override the sudo setting in the
+                         class, if true or false, it uses/doesnt use sudo
+                         accordingly (default None)
+        prefix -- if given, each line of the output of the commands is
+                  prefixed with it (default None)
+        returncode -- the returncode with which the command already failed
+                      with the packages, if None, it is executed first
+                      (default None)
+        """
+        if returncode is None:
+            fullcommand = '{} {}'.format(command, ' '.join(packages))
+            returncode = self._executecommand(fullcommand, override_sudo, prefix)
+            if returncode == 0:
+                return []
+        if len(packages) == 1:
+            return list(packages)
+        middle = len(packages) // 2
+        halves = [packages[:middle], packages[middle:]]
+        returncodes = [self._executecommand('{} {}'.format(command, \
+                ' '.join(half)), override_sudo, prefix) for half in halves]
+        failed = []
+        for half, halfreturncode in zip(halves, returncodes):
+            if halfreturncode != 0:
+                failed += self._executebisecting(command, half, override_sudo, \
+                        prefix, halfreturncode)
+        return failed
+
+    def _executebatched(self, command, packages, action, override_sudo=None, \
+            prefix=None):
+        """Execute the command with the packages in batches
+
+        Returns a list of the packages with which the command failed, a
+        warning listing them is issued as well.
+
+        arguments:
+        command -- the command to which the packages are appended
+        packages -- a list of the packages as strings
+        action -- the name of what the command does, for the warning
+        override_sudo -- if None, it doesnt override the sudo setting in the
+                         class, if true or false, it uses/doesnt use sudo
+                         accordingly (default None)
+        prefix -- if given, each line of the output of the commands is
+                  prefixed with it (default None)
+        """
+        failed = []
+        for batch in self._batch(command, packages):
+            failed += self._executebisecting(command, batch, override_sudo, \
+                    prefix)
+        _installed_cache.pop(self.name, None)
+        if failed:
+            message = 'Packages {} could not be {} with {}, skipping'.format( \
+                    ', '.join(failed), action, self.name)
+            warnings.warn(message, UserWarning)
+        return failed
+
+    def _getdatabasemtime(self):
+        """Return the modification time of the database, or None if unknown"""
+        if not self.database:
+            return None
+        try:
+            return os.stat(os.path.expanduser(self.database)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _getcachefilepath(self):
+        """Return the path to the file caching the installed packages on disk"""
+        filename = '{}.json'.format(cache.cache_key(self.name))
+        return os.path.join(cache.cache_dir('installed'), filename)
+
+    def _readinstalledcache(self, mtime):
+        """Return the installed packages cached on disk, or None if invalid
+
+        arguments:
+        mtime -- the current modification time of the database
+        """
+        cached = cache.readjson(self._getcachefilepath())
+        if not isinstance(cached, dict) or cached.get('database_mtime') != mtime:
+            return None
+        return set(cached.get('packages', []))
+
+    def _writeinstalledcache(self, mtime, packages):
+        """Cache the installed packages on disk
+
+        arguments:
+        mtime -- the current modification time of the database
+        packages -- a set of the installed packages
+        """
+        try:
+            cache.writejson(self._getcachefilepath(), \
+                    {'database_mtime': mtime, 'packages': sorted(packages)})
+        except OSError:
+            pass
 
+    def getinstalled(self):
+        """Return a set of the names of the installed packages
 
-    def install(self, packages, override_sudo=None):
+        The query command is executed at most once per run, its result is
+        cached in memory and, if the packagemanager has a database, on disk
+        until the database changes. Returns None if the packagemanager has no
+        query command or the query command failed.
+        """
+        if self.name in _installed_cache:
+            return _installed_cache[self.name]
+        if not self.query_command:
+            return None
+        mtime = self._getdatabasemtime()
+        installed = None
+        if mtime is not None:
+            installed = self._readinstalledcache(mtime)
+        elif not self.database:
+            usertextio.print_verbose('The installed packages of {} are not ' \
+                    'cached on disk, since it has no database'.format(self.name))
+        else:
+            usertextio.print_verbose('The installed packages of {} are not ' \
+                    'cached on disk, since its database {} could not be ' \
+                    'found'.format(self.name, self.database))
+        if installed is None:
+            output = executor.capture_command(self.query_command)
+            if output is not None:
+                installed = {line.split()[0] for line in output.splitlines() \
+                        if line.strip()}
+                if mtime is not None:
+                    self._writeinstalledcache(mtime, installed)
+        _installed_cache[self.name] = installed
+        return installed
+
+    def filtermissing(self, packages):
+        """Return the given packages which are not installed
+
+        If the installed packages can't be queried, all packages are returned
+
+        arguments:
+        packages -- a list of packages as strings
+        """
+        installed = self.getinstalled()
+        if installed is None:
+            return list(packages)
+        return [package for package in packages if package not in installed]
+
+    def filterinstalled(self, packages):
+        """Return the given packages which are installed
+
+        If the installed packages can't be queried, all packages are returned
+
+        arguments:
+        packages -- a list of packages as strings
+        """
+        installed = self.getinstalled()
+        if installed is None:
+            return list(packages)
+        return [package for package in packages if package in installed]
+
+
+    def install(self, packages, override_sudo=None, prefix=None):
         """Install the given packages
 
+        The packages are installed in as few commands as the argument limit and
+        max_batch allow. Returns a list of the packages which could not be
+        installed.
+
         arguments:
         packages -- a list of all the packages to install as strings
         override_sudo -- if None, it doesnt override the sudo setting in the
                          class, if true or false, it uses/doesnt use sudo
                          accordingly (default None)
+        prefix -- if given, each line of the output of the commands is
+                  prefixed with it (default None)
         """
-        if packages:
-            command = '{} {}'.format(self.install_command, ' '.join(packages))
-            self._executecommand(command, override_sudo)
+        if not packages:
+            return []
+        return self._executebatched(self.install_command, packages, \
+                'installed', override_sudo, prefix)
 
 
-    def uninstall(self, packages, override_sudo=None):
+    def uninstall(self, packages, override_sudo=None, prefix=None):
         """Uninstall the given packages
 
+        The packages are uninstalled in as few commands as the argument limit
+        and max_batch allow. Returns a list of the packages which could not be
+        uninstalled.
+
         arguments:
         packages -- a list of all the packages to uninstall as strings
         override_sudo -- if None, it doesnt override the sudo setting in the
                          class, if true or false, it uses/doesnt use sudo
                          accordingly (default None)
+        prefix -- if given, each line of the output of the commands is
+                  prefixed with it (default None)
         """
-        if packages:
-            command = '{} {}'.format(self.uninstall_command, ' '.join(packages))
-            self._executecommand(command, override_sudo)
+        if not packages:
+            return []
+        return self._executebatched(self.uninstall_command, packages, \
+                'uninstalled', override_sudo, prefix)
@@ -1,4 +1,7 @@
+import os
+
 from zztools import configfilemanager
+from zztools import catalog
 
 
 def getpackagesfromjson(json):
@@ -20,7 +23,8 @@ def getpackagesfromfile(path):
     Imports the pseudopackages at the given path and returns them in a json
     type format. The contents of the file are converted to json by the
     configfilemanager, the real content of the file could be in json, yaml or
-    something similar.
+    something similar. If the file is a compiled catalog, a Catalog object is
+    returned instead, which looks up the pseudopackages when they're used.
 
     arguments:
     path -- the path to the file containing the pseudopackages
@@ -35,6 +39,8 @@ def getpackagesfromfile(path):
                                 attribute filename which contains the message
     """
     try:
+        if os.path.splitext(path)[1] in catalog.extensions:
+            return catalog.Catalog(path)
         json = configfilemanager.getconfigfromfile(path)
     except FileNotFoundError as e:
         e.message = 'File with Packages at path {} could not be found'.format(e.filename)
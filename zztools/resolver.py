@@ -0,0 +1,114 @@
+# the resolvers, by id of the pseudopackages and names of the packagemanagers
+_resolvers = {}
+
+
+def getresolver(pseudopacks, packagemanagers):
+    """Return the PackageResolver for the given pseudopackages and managers
+
+    Only one PackageResolver is created for each combination of pseudopackages
+    and packagemanager order, so all collections using them share it.
+
+    arguments:
+    pseudopacks -- the psudopackages as imported directly from json into
+                   python, or a Catalog
+    packagemanagers -- a list of PackageManager objects which also specify
+                       the order in of which packagemanager to use first
+    """
+    key = (id(pseudopacks), tuple(pm.name for pm in packagemanagers))
+    resolver = _resolvers.get(key)
+    if resolver is None or resolver.pseudopacks is not pseudopacks:
+        resolver = PackageResolver(pseudopacks, packagemanagers)
+        _resolvers[key] = resolver
+    return resolver
+
+
+class PackageResolver():
+    """Resolves pseudopackages to the packages of packagemanagers
+
+    A pseudopackage is resolved to the first packagemanager in the given
+    order which provides it and the actual name of the package in that
+    packagemanager. Each pseudopackage is only resolved once.
+
+    instance methods:
+    resolve() -- resolves a pseudopackage
+    resolvemany() -- resolves multiple pseudopackages at once
+
+    instance variables:
+    pseudopacks -- the psudopackages as imported directly from json into
+                   python, or a Catalog
+    pm_names -- a tuple of the names of the packagemanagers in order
+    """
+
+    def __init__(self, pseudopacks, packagemanagers):
+        """Constructor
+
+        arguments:
+        pseudopacks -- the psudopackages as imported directly from json into
+                       python, or a Catalog
+        packagemanagers -- a list of PackageManager objects which also specify
+                           the order in of which packagemanager to use first
+        """
+        self.pseudopacks = pseudopacks
+        self.pm_names = tuple(pm.name for pm in packagemanagers)
+        self._ranks = {pm_name: rank for rank, pm_name \
+                in reversed(list(enumerate(self.pm_names)))}
+        self._resolved = {}
+
+    def _lookup(self, pseudonames):
+        """Return the entries of the given pseudopackages which are available
+
+        arguments:
+        pseudonames -- a list of the names of the pseudopackages
+        """
+        if hasattr(self.pseudopacks, 'getmany'):
+            return self.pseudopacks.getmany(pseudonames)
+        return {pseudoname: self.pseudopacks[pseudoname] \
+                for pseudoname in pseudonames if pseudoname in self.pseudopacks}
+
+    def resolvemany(self, pseudonames):
+        """Resolve the given pseudopackages
+
+        Returns a dict mapping each given pseudopackage which is available to
+        a tuple of the name of the packagemanager to use and the actual name of
+        the package in it, or to None if none of the packagemanagers provides
+        it. Pseudopackages which are not available are left out.
+
+        arguments:
+        pseudonames -- an iterable of the names of the pseudopackages
+        """
+        pseudonames = list(dict.fromkeys(pseudonames))
+        unresolved = [pseudoname for pseudoname in pseudonames \
+                if pseudoname not in self._resolved]
+        if unresolved:
+            entries = self._lookup(unresolved)
+            ranks = self._ranks
+            for pseudoname in unresolved:
+                entry = entries.get(pseudoname)
+                if entry is None:
+                    self._resolved[pseudoname] = False
+                    continue
+                best = min((ranks[pm_name] for pm_name in entry \
+                        if pm_name in ranks), default=None)
+                if best is None:
+                    self._resolved[pseudoname] = None
+                else:
+                    pm_name = self.pm_names[best]
+                    self._resolved[pseudoname] = (pm_name, entry[pm_name])
+        return {pseudoname: self._resolved[pseudoname] \
+                for pseudoname in pseudonames \
+                if self._resolved[pseudoname] is not False}
+
+    def resolve(self, pseudoname):
+        """Resolve the given pseudopackage
+
+        Returns a tuple of the name of the packagemanager to use and the actual
+        name of the package in it, or None if none of the packagemanagers
+        provides it.
+
+        arguments:
+        pseudoname -- the name of the pseudopackage
+
+        exceptions:
+        KeyError -- if the pseudopackage is not available
+        """
+        return self.resolvemany([pseudoname])[pseudoname]
@@ -0,0 +1,310 @@
+import os
+import collections
+import concurrent.futures
+
+import zztools.steps.lazystep as lazystep_mod
+import zztools.steps.liststep as liststep_mod
+from zztools import journal
+from zztools.exceptions import ConfigValueError, StepFailedError
+from zztools.utilities import executor
+from zztools.utilities import usertextio
+
+# whether a step whose command failed stops the execution of the todolist,
+# otherwise only exceptions do
+fail_fast = False
+
+
+def _normpath(path):
+    """Return the absolute, normalized version of the given path"""
+    return os.path.normpath(os.path.abspath(os.path.expanduser(path)))
+
+
+def _pathsoverlap(path, otherpath):
+    """Check whether one of the given paths is the same as or inside the other
+
+    arguments:
+    path -- a normalized path
+    otherpath -- another normalized path
+    """
+    if path == otherpath:
+        return True
+    return path.startswith(otherpath.rstrip(os.sep) + os.sep) \
+            or otherpath.startswith(path.rstrip(os.sep) + os.sep)
+
+
+def checkfailed(step):
+    """Raise a StepFailedError if the command of the step failed under fail_fast
+
+    The error message contains the last lines of the output of the command,
+    if the step kept its result.
+
+    arguments:
+    step -- the executed step
+    """
+    if not fail_fast or step.returncode in (None, 0):
+        return
+    message = 'Step {} failed with returncode {}'.format(step.name \
+            or step.stepid or type(step).__name__, step.returncode)
+    result = getattr(step, 'result', None)
+    if result is not None:
+        message += ' after {:.1f}s'.format(result.duration)
+        if result.tail:
+            message += ', its last output was:\n' + ''.join(result.tail) \
+                    .rstrip('\n')
+    raise StepFailedError(message, step)
+
+
+class _Node():
+    """A step in the dependency graph of the scheduler
+
+    instance variables:
+    step -- the step this node executes
+    paths -- a tuple of the normalized read and written paths of the step, or
+             None if they are unknown
+    deps -- the set of nodes which have to be executed before this one
+    dependents -- the set of nodes which depend on this one
+    conditions -- a list of lists of steps, the node is skipped if none of the
+                  steps of one of the lists changed something
+    """
+
+    def __init__(self, step):
+        """Constructor
+
+        arguments:
+        step -- the step this node executes
+        """
+        self.step = step
+        paths = step.getpaths()
+        if paths is not None:
+            paths = tuple([_normpath(path) for path in part] for part in paths)
+        self.paths = paths
+        self.deps = set()
+        self.dependents = set()
+        self.conditions = []
+
+    def isskipped(self):
+        """Check whether the conditions of this node skip it"""
+        return any(all(step.changed is False for step in steps) \
+                for steps in self.conditions)
+
+    def conflictswith(self, other):
+        """Check whether this node and the other touch the same paths
+
+        Two nodes conflict if one of them writes a path the other one reads or
+        writes. Nodes with unknown paths are handled by the scheduler.
+
+        arguments:
+        other -- the node which to check against
+        """
+        reads, writes = self.paths
+        otherreads, otherwrites = other.paths
+        for path in writes:
+            for otherpath in otherreads + otherwrites:
+                if _pathsoverlap(path, otherpath):
+                    return True
+        for path in reads:
+            for otherpath in otherwrites:
+                if _pathsoverlap(path, otherpath):
+                    return True
+        return False
+
+
+class Scheduler():
+    """Executes the steps of a todolist concurrently
+
+    The steps of the todolist, including the ones of nested ListSteps, are
+    turned into a dependency graph. A step depends on the steps named in its
+    \"needs\" attribute and on every earlier step which touches the same paths
+    as it does, or named in its \"if_changed\" attribute. Steps whose
+    if_changed steps didn't change anything are skipped. Steps whose paths
+    are unknown are executed after every earlier step and before every later
+    one, as they would be when executing the todolist in order. If such a
+    step has \"needs\", it only waits for those and earlier steps without
+    them instead of all earlier steps, but later steps with known paths still
+    wait for it. Steps without dependencies between them are executed
+    concurrently.
+
+    instance methods:
+    execute() -- executes the steps of the todolist
+
+    instance variables:
+    jobs -- the maximum number of steps which are executed at the same time
+    nodes -- a list of the nodes of the dependency graph in todolist order
+    """
+
+    def __init__(self, todolist, jobs):
+        """Constructor
+
+        arguments:
+        todolist -- the todolist which to execute
+        jobs -- the maximum number of steps to execute at the same time
+
+        exceptions:
+        ConfigValueError -- if a step needs a step which doesn't exist or the
+                            steps depend on each other in a circle
+                            this error contains an attribute \"message\", which
+                            contains the errormessage
+        """
+        self.jobs = max(1, jobs)
+        self.nodes = []
+        self._addtodolist(todolist)
+        self._inferdependencies()
+        self._checkforcycles()
+
+    def _addtodolist(self, todolist):
+        """Add the steps of the given todolist to the graph
+
+        The steps of nested ListSteps are added as well, the needs of a
+        ListStep apply to all of its steps. Returns a dict mapping the names of
+        the steps of the todolist to the nodes they were turned into. The
+        if_changed attribute of a ListStep applies to all of its steps as
+        well. Lazy list steps are constructed, since their steps are part of
+        the graph.
+
+        arguments:
+        todolist -- the todolist whose steps to add
+        """
+        nodes_by_name = {}
+        steps_by_name = {}
+        pending = []
+        for step in todolist.steps:
+            resolved = step
+            if isinstance(step, lazystep_mod.LazyStep) and step.type == 'list':
+                resolved = step.resolve()
+            if isinstance(resolved, liststep_mod.ListStep):
+                start = len(self.nodes)
+                self._addtodolist(resolved.todolist)
+                stepnodes = self.nodes[start:]
+            else:
+                node = _Node(step)
+                self.nodes.append(node)
+                stepnodes = [node]
+            if step.name is not None:
+                nodes_by_name[step.name] = stepnodes
+                steps_by_name[step.name] = step
+            if step.needs or step.if_changed:
+                pending.append((step, stepnodes))
+        for step, stepnodes in pending:
+            conditions = step.getconditions(steps_by_name)
+            if conditions:
+                for node in stepnodes:
+                    node.conditions.append(conditions)
+            for name in step.needs + step.if_changed:
+                try:
+                    needed = nodes_by_name[name]
+                except KeyError:
+                    message = 'Step {} needed by step {} could not be ' \
+                            'found'.format(name, step.name)
+                    raise ConfigValueError(message)
+                for node in stepnodes:
+                    node.deps.update(needed)
+        return nodes_by_name
+
+    def _inferdependencies(self):
+        """Add the dependencies implied by the order and paths of the steps"""
+        for index, node in enumerate(self.nodes):
+            for earlier in self.nodes[:index]:
+                if node.paths is None and node.step.needs:
+                    # its needs replace the order, except behind a barrier
+                    if earlier.paths is None and not earlier.step.needs:
+                        node.deps.add(earlier)
+                elif node.paths is None or earlier.paths is None:
+                    node.deps.add(earlier)
+                elif node.conflictswith(earlier):
+                    node.deps.add(earlier)
+        for node in self.nodes:
+            node.deps.discard(node)
+            for dep in node.deps:
+                dep.dependents.add(node)
+
+    def _checkforcycles(self):
+        """Raise a ConfigValueError if the steps depend on each other in a circle"""
+        remaining = {node: len(node.deps) for node in self.nodes}
+        ready = [node for node in self.nodes if not node.deps]
+        visited = 0
+        while ready:
+            node = ready.pop()
+            visited += 1
+            for dependent in node.dependents:
+                remaining[dependent] -= 1
+                if not remaining[dependent]:
+                    ready.append(dependent)
+        if visited != len(self.nodes):
+            message = 'The needs of the steps in the todolist form a circle'
+            raise ConfigValueError(message)
+
+    def execute(self):
+        """Execute all steps, running independent ones concurrently
+
+        If a step raises an exception, or its command fails while fail_fast is
+        set, no further steps are started and the commands of the ones which
+        are already running are terminated, so they fail quickly. Once they
+        stopped, the exception, or a StepFailedError, is raised.
+        """
+        remaining = {node: len(node.deps) for node in self.nodes}
+        ready = collections.deque(node for node in self.nodes if not node.deps)
+        running = {}
+        try:
+            self._executenodes(remaining, ready, running)
+        finally:
+            executor.resume_commands()
+
+    def _executenodes(self, remaining, ready, running):
+        """Execute the nodes which are ready until all are done
+
+        arguments:
+        remaining -- a dict mapping the nodes to the number of their
+                     dependencies which aren't done yet
+        ready -- the deque of nodes which are ready to be executed
+        running -- a dict mapping the futures of the running steps to their
+                   nodes
+        """
+        error = None
+        with concurrent.futures.ThreadPoolExecutor(self.jobs) as pool:
+            while ready or running:
+                while ready and error is None and len(running) < self.jobs:
+                    node = ready.popleft()
+                    if node.isskipped():
+                        usertextio.print_verbose('Skipping step {}, nothing ' \
+                                'it depends on changed'.format(node.step.name))
+                        node.step.changed = False
+                        self._release(node, remaining, ready)
+                        continue
+                    running[pool.submit(journal.execute, node.step)] = node
+                if not running:
+                    break
+                done, _ = concurrent.futures.wait(running, \
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    exception = future.exception()
+                    if exception is None:
+                        try:
+                            checkfailed(node.step)
+                        except StepFailedError as e:
+                            exception = e
+                    if exception is not None:
+                        if error is None:
+                            error = exception
+                            if running:
+                                usertextio.print_verbose('A step failed, ' \
+                                        'terminating the running steps')
+                                executor.cancel_commands()
+                        continue
+                    self._release(node, remaining, ready)
+        if error is not None:
+            raise error
+
+    def _release(self, node, remaining, ready):
+        """Mark the node as done and queue the dependents which became ready
+
+        arguments:
+        node -- the node which is done
+        remaining -- a dict mapping the nodes to the number of their
+                     dependencies which aren't done yet
+        ready -- the deque of nodes which are ready to be executed
+        """
+        for dependent in node.dependents:
+            remaining[dependent] -= 1
+            if not remaining[dependent]:
+                ready.append(dependent)
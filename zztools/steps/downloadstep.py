@@ -1,5 +1,8 @@
+import os
+
 from .step import Step
 from zztools.utilities import downloader
+from zztools.exceptions import DownloadError
 
 
 class DownloadStep(Step):
@@ -9,11 +12,15 @@ class DownloadStep(Step):
     fromjson() -- returns an DownloadStep object from json
 
     instance methods:
+    getpaths() -- returns the paths this step reads and writes
+    getmemokey() -- returns the key identifying this step in the memo store
+    getinputs() -- returns the inputs of this step
     execute -- executes the step
 
     instance variables:
     url -- the url from which to download
     to -- where to download to, can be None
+    sha256 -- the expected sha256 hash of the download, can be None
     """
 
     def fromjson(stepjson, listjson):
@@ -35,18 +42,52 @@ class DownloadStep(Step):
             e.message = 'Missing attribute {} in download step'.format(e.args[0])
             raise
         to = command.get('to', None)
-        return DownloadStep(url, to)
+        sha256 = command.get('sha256', None)
+        return DownloadStep(url, to, sha256)
 
-    def __init__(self, url, to=None):
+    def __init__(self, url, to=None, sha256=None):
         """Constructor
 
         arguments:
         url -- the url which to download
         to -- where to download it to
+        sha256 -- the expected sha256 hash of the download
         """
         self.url = url
         self.to = to
+        self.sha256 = sha256
+        self._validators = None
+
+    def getpaths(self):
+        """Return the paths this step reads and writes
+
+        The downloaded file is named after the last part of the url, like wget
+        does it
+        """
+        todir = self.to or os.getcwd()
+        return [], [os.path.join(todir, downloader._filename(self.url))]
+
+    def getmemokey(self):
+        """Return the key identifying this step in the memo store"""
+        return ['download', self.url, self.getpaths()[1][0]]
+
+    def getinputs(self):
+        """Return the inputs of this step
+
+        The inputs are the expected hash of the download, or the validators of
+        the url if no hash is given. The validators are only requested once,
+        not again after executing this step.
+        """
+        if self.sha256 is not None:
+            return [self.sha256]
+        if self._validators is None:
+            try:
+                # wrapped in a list, since the url may have no validators
+                self._validators = [downloader.getvalidators(self.url)]
+            except DownloadError:
+                return None
+        return self._validators[0]
 
     def execute(self):
         """Downloads the url with the given tool"""
-        downloader.download(self.url, todir=self.to)
+        downloader.download(self.url, todir=self.to, sha256=self.sha256)
@@ -1,5 +1,8 @@
+import os
+
 from .step import Step
 from zztools.utilities import executor
+from zztools.exceptions import ConfigValueError
 
 
 class ExecuteStep(Step):
@@ -9,12 +12,20 @@ class ExecuteStep(Step):
     fromjson() -- returns an ExecuteStep object from json
 
     instance methods:
+    getmemokey() -- returns the key identifying this step in the memo store
+    getinputs() -- returns the inputs of this step
     execute() -- executes the step
 
     instance variables:
     command -- the command as one in a string
+    timeout -- the time in seconds after which the command is terminated, can
+               be None
+    result -- the CommandResult of the last execution, None if the step wasn't
+              executed yet
     """
 
+    result = None
+
     def fromjson(stepjson, listjson):
         """Return an object of this class from a json
 
@@ -26,22 +37,44 @@ class ExecuteStep(Step):
         KeyError -- if a needed attribute in the json is not found
                     this error contains an attribute \"message\", which
                     contains the errormessage
+        ConfigValueError -- if some attribute in the config has an invalid value
+                            this error contains an attribute \"message\", which
+                            contains the errormessage
         """
         try:
             command = stepjson['command']
         except KeyError as e:
             e.message = 'Missing command for execute step'
             raise
-        return ExecuteStep(command)
+        timeout = stepjson.get('timeout', None)
+        if timeout is not None and (not isinstance(timeout, (int, float)) \
+                or isinstance(timeout, bool) or timeout <= 0):
+            message = 'Timeout of execute step {} has to be a positive ' \
+                    'number'.format(command)
+            raise ConfigValueError(message)
+        return ExecuteStep(command, timeout)
 
-    def __init__(self, command):
+    def __init__(self, command, timeout=None):
         """Constructor
 
         arguments:
         command -- the command of this step as a string
+        timeout -- the time in seconds after which the command is terminated,
+                   if None, it can run as long as it needs (default None)
         """
         self.command = command
+        self.timeout = timeout
+
+    def getmemokey(self):
+        """Return the key identifying this step in the memo store"""
+        return ['execute', self.command, os.getcwd()]
+
+    def getinputs(self):
+        """Return the inputs of this step, the command and where it runs"""
+        return [self.command, os.getcwd()]
 
     def execute(self):
         """Executes the command of this step"""
-        executor.execute_command(self.command)
+        self.result = executor.run_command(self.command, \
+                timeout=self.timeout)
+        self.returncode = self.result.returncode
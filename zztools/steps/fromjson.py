@@ -1,11 +1,20 @@
 from .stepmap import stepmap
+from .lazystep import LazyStep
 from zztools.exceptions import ConfigValueError
 
+# the types of steps which are expensive to construct, so they are only
+# constructed when they are needed
+lazytypes = ('collection', 'list')
+
 def fromjson(stepjson, listjson):
     """Return a Step object
 
     Returns an object of a child class of Step, a CollectionStep, ExecuteStep,
-    DownloadStep or UnpackStep
+    DownloadStep or UnpackStep. Steps whose type is in lazytypes are returned
+    as a LazyStep, which constructs them when they are needed, only their
+    command is checked for now. The optional \"name\", \"needs\",
+    \"if_changed\" and \"memoize\" attributes of the step are set on the
+    returned object
 
     arguments:
     stepjson -- the json of the whole step already imported into python
@@ -34,4 +43,22 @@ def fromjson(stepjson, listjson):
     except KeyError:
         message = 'Invalid step type {}'.format(stepjson['type'])
         raise ConfigValueError(message)
-    return stepfromjson(stepjson, listjson)
+    if type in lazytypes:
+        if 'command' not in stepjson:
+            e = KeyError('command')
+            e.message = 'Missing command attribute in {} step'.format(type)
+            raise e
+        step = LazyStep(stepfromjson, stepjson, listjson)
+    else:
+        step = stepfromjson(stepjson, listjson)
+    step.name = stepjson.get('name', None)
+    needs = stepjson.get('needs', ())
+    if isinstance(needs, str):
+        needs = (needs,)
+    step.needs = tuple(needs)
+    if_changed = stepjson.get('if_changed', ())
+    if isinstance(if_changed, str):
+        if_changed = (if_changed,)
+    step.if_changed = tuple(if_changed)
+    step.memoize = bool(stepjson.get('memoize', True))
+    return step
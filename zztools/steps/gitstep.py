@@ -1,7 +1,46 @@
+import os
+
 from .step import Step
 from zztools.utilities import git
 from zztools.exceptions import ConfigValueError
 
+# the options of a clone which can be given in the json, by their type
+_clone_options = {'depth': int, 'branch': str, 'ref': str, 'filter': str, \
+        'sparse': list, 'submodule_depth': int}
+
+
+def clone_options_fromjson(command):
+    """Return a dict of the clone options given in the json of a command
+
+    The options are depth, branch, ref, filter, sparse and submodule_depth,
+    as taken by zztools.utilities.git.clone. Options not given are left out.
+    sparse can also be a single path.
+
+    arguments:
+    command -- the json of the command of a step already imported into python
+
+    exceptions:
+    ConfigValueError -- if an option has the wrong type or depth isn't
+                        positive
+                        this error contains an attribute \"message\", which
+                        contains the errormessage
+    """
+    options = {}
+    for name, optiontype in _clone_options.items():
+        value = command.get(name, None)
+        if value is None:
+            continue
+        if name == 'sparse' and isinstance(value, str):
+            value = [value]
+        if not isinstance(value, optiontype) or isinstance(value, bool):
+            message = 'Invalid value {} for {} of git clone'.format(value, name)
+            raise ConfigValueError(message)
+        options[name] = value
+    if options.get('depth', 1) < 1 or options.get('submodule_depth', 0) < 0:
+        message = 'The depth of a git clone has to be positive'
+        raise ConfigValueError(message)
+    return options
+
 
 class GitStep(Step):
     """A step that executes a git action
@@ -17,6 +56,9 @@ class GitStep(Step):
     def fromjson(stepjson, listjson):
         """Return a GitStep object of a child step
 
+        The action clone returns a GitCloneStep, or a GitSyncStep if update is
+        set. The action sync returns a GitSyncStep.
+
         arguments:
         stepjson -- the json of the whole step already imported into python
         listjson -- the json of the whole list file the step was in
@@ -27,14 +69,19 @@ class GitStep(Step):
         except KeyError as e:
             e.message = 'Missing attribute {} in git step'.format(e.args[0])
             raise
-        if action == 'clone':
+        if action in ('clone', 'sync'):
             try:
                 remoteurl = command['url']
             except KeyError as e:
-                e.message = 'Missing attribute {} in git clone step'.format(e.args[0])
+                e.message = 'Missing attribute {} in git {} step'.format( \
+                        e.args[0], action)
                 raise
             path = command.get('path', None)
-            return GitCloneStep(remoteurl, path)
+            options = clone_options_fromjson(command)
+            if action == 'sync' or command.get('update', False):
+                reset = command.get('reset', False)
+                return GitSyncStep(remoteurl, path, reset, **options)
+            return GitCloneStep(remoteurl, path, **options)
         else:
             message = 'Invalid action type {} for git step'.format(action)
             raise ConfigValueError(message)
@@ -58,22 +105,73 @@ class GitCloneStep(GitStep):
     constructor of GitStep, but defines its own
 
     instance methods:
+    getpaths() -- returns the paths this step reads and writes
     execute -- execute this step
+
+    instance variables:
+    options -- a dict of the further options of the clone, as taken by
+               zztools.utilities.git.clone
     """
 
-    def __init__(self, remoteurl, path=None):
+    def __init__(self, remoteurl, path=None, **options):
         """Constructor
 
-        since with this constructor, only the priorities are different, it only
+        since with this constructor, only the priorities are different, it
         calls the constructor of GitStep, with the given values
 
         arguments:
         remoturl -- url of the remote repository
         path -- path for the repository to be cloned into, if none is given,
                 it is cloned into the current working directory
+        options -- further options of the clone, like depth, branch, ref,
+                   filter, sparse and submodule_depth, see
+                   zztools.utilities.git.clone
         """
         super(GitCloneStep, self).__init__(path, remoteurl)
+        self.options = options
+
+    def getpaths(self):
+        """Return the paths this step reads and writes"""
+        path = self.path
+        if not path:
+            path = os.path.join(os.getcwd(), git.get_repo_name_from_url(self.remoteurl))
+        return [], [path]
+
+    def execute(self):
+        """Execute this step"""
+        git.clone(self.remoteurl, self.path, **self.options)
+
+
+class GitSyncStep(GitCloneStep):
+    """A step that clones a repository or updates an existing checkout of it
+
+    This class inherits from GitCloneStep. After executing it, its changed
+    attribute tells whether the checked out commit changed.
+
+    instance methods:
+    execute -- execute this step
+
+    instance variables:
+    reset -- whether to reset the checkout if it can't be fast-forwarded
+    """
+
+    def __init__(self, remoteurl, path=None, reset=False, **options):
+        """Constructor
+
+        arguments:
+        remoturl -- url of the remote repository
+        path -- path of the checkout, if none is given, it is the name of the
+                repository in the current working directory
+        reset -- whether to reset the checkout to the fetched commit,
+                 discarding local changes, if it can't be fast-forwarded
+                 (default False)
+        options -- further options, like depth, branch, ref, filter, sparse
+                   and submodule_depth, see zztools.utilities.git.sync
+        """
+        super(GitSyncStep, self).__init__(remoteurl, path, **options)
+        self.reset = reset
 
     def execute(self):
         """Execute this step"""
-        git.clone(self.remoteurl, self.path)
+        self.changed = git.sync(self.remoteurl, self.path, reset=self.reset, \
+                **self.options)
@@ -0,0 +1,77 @@
+import threading
+
+from .step import Step
+
+
+class LazyStep(Step):
+    """A step which is only constructed from its json when it is needed
+
+    Constructing some steps is expensive, e.g. a collection step parses
+    several config files and a list step loads and constructs a whole
+    todolist, possibly from another file. A LazyStep keeps the json of such a
+    step and constructs it the first time it is executed or otherwise needed,
+    so steps which are never reached don't cost anything. List steps are
+    constructed when the ids of the steps in the journal are assigned, since
+    their ids depend on their steps.
+
+    instance methods:
+    resolve() -- constructs the step, only once
+    execute() -- executes the step
+
+    The json of the whole list file is kept privately, so it isn't part of
+    the identity of the step in the journal and editing other steps of the
+    file doesn't change it.
+
+    instance variables:
+    type -- the type of the step in the json
+    stepjson -- the json of the whole step already imported into python
+    """
+
+    def __init__(self, stepfromjson, stepjson, listjson):
+        """Constructor
+
+        arguments:
+        stepfromjson -- the function which constructs the step from the json
+        stepjson -- the json of the whole step already imported into python
+        listjson -- the json of the whole list file the step was in
+        """
+        self.type = stepjson['type']
+        self.stepjson = stepjson
+        self._listjson = listjson
+        self._stepfromjson = stepfromjson
+        self._step = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        """Construct the step, if it wasn't constructed yet, and return it
+
+        The name, needs, if_changed and memoize attributes of this step are
+        passed on to the constructed step.
+
+        exceptions:
+        FileNotFoundError -- if the file at the given path is not found
+                             this error contains an attribute \"message\", which
+                             contains the errormessage
+        KeyError -- if a needed attribute in the json is not found
+                    this error contains an attribute \"message\", which
+                    contains the errormessage
+        ConfigValueError -- if some attribute in the config has an invalid value
+                            this error contains an attribute \"message\", which
+                            contains the errormessage
+        """
+        with self._lock:
+            if self._step is None:
+                step = self._stepfromjson(self.stepjson, self._listjson)
+                step.name = self.name
+                step.needs = self.needs
+                step.if_changed = self.if_changed
+                step.memoize = self.memoize
+                self._step = step
+            return self._step
+
+    def execute(self):
+        """Construct and execute the step"""
+        step = self.resolve()
+        step.execute()
+        self.changed = step.changed
+        self.returncode = step.returncode
@@ -1,14 +1,18 @@
+import os
 import validators
 
 from .step import Step
-from .gitstep import GitCloneStep
+from .gitstep import GitCloneStep, GitSyncStep, clone_options_fromjson
 from .unpackstep import DownloadUnpackStep
 from .liststep import ListStep
 from .rmstep import RmStep
+from .workspacestep import WorkspaceStep
 import zztools.todolist as todolist_mod
+from zztools import memo
 from zztools.utilities import maker
 from zztools.utilities import git
 from zztools.utilities import temp
+from zztools.exceptions import ConfigValueError
 
 class MakeStep(Step):
     """A step that makes something
@@ -18,9 +22,17 @@ class MakeStep(Step):
     class methods:
     fromjson() -- returns an object from this class from a json
 
+    instance methods:
+    getpaths() -- returns the paths this step reads and writes
+    getmemokey() -- returns the key identifying this step in the memo store
+    getinputs() -- returns the inputs of this step
+    execute() -- executes the step
+
     instance variables:
     path -- the path to the makefile
     target -- the target which to make
+    jobs -- the number of jobs make runs in parallel, if None, make shares
+            the jobs available to all builds with the others
     """
 
     def fromjson(stepjson, listjson):
@@ -29,8 +41,13 @@ class MakeStep(Step):
         when the path in the json is an actual path, a normal MakeStep is
         returnd. If it is a url, it is checked whether it is a git url or not.
         If it is a git url, a ListStep containing a GitCloneStep and a
-        MakeStep is returned. If it is just a normal url, a ListStep containing
-        a DownloadUnpackStep and a MakeStep is returned.
+        MakeStep is returned, the options of the clone, like depth or branch,
+        can be given in the json like for a git clone step. If it is just a
+        normal url, a ListStep containing a DownloadUnpackStep and a MakeStep
+        is returned. If workspace is set in the json, the sources of a url are
+        kept in a persistent workspace and updated in place on later runs, so
+        make only rebuilds what changed. jobs in the json sets the number of
+        jobs of make.
 
         arguments:
         stepjson -- the json of the whole step already imported into python
@@ -41,6 +58,9 @@ class MakeStep(Step):
                     this error contains an attribute \"message\", which
                     contains the errormessage
         ValueError -- if the name of the repo cound't be found in the url
+        ConfigValueError -- if an option of the clone or jobs is invalid
+                            this error contains an attribute \"message\", which
+                            contains the errormessage
         """
         try:
             command = stepjson['command']
@@ -49,39 +69,92 @@ class MakeStep(Step):
             e.message = 'Missing attribute {} in make step'.format(e.args[0])
             raise
         target = command.get('target', None)
+        jobs = command.get('jobs', None)
+        if jobs is not None and (not isinstance(jobs, int) \
+                or isinstance(jobs, bool) or jobs < 1):
+            message = 'Invalid number of jobs {} in make step'.format(jobs)
+            raise ConfigValueError(message)
         if validators.url(path):
             if git.is_git_url(path):
-                return gitmakestep(path, target)
+                return gitmakestep(path, target, \
+                        command.get('workspace', False), jobs, \
+                        **clone_options_fromjson(command))
             else:
-                return downloadmakestep(path, target)
+                return downloadmakestep(path, target, \
+                        command.get('workspace', False), jobs)
         else:
-            return MakeStep(path, target)
+            return MakeStep(path, target, jobs)
 
-    def __init__(self, path, target=None):
+    def __init__(self, path, target=None, jobs=None):
         """Constructor
 
         arguments:
         path -- path to the makefile
         target -- targte which to make
+        jobs -- the number of jobs make runs in parallel, if None, the jobs
+                available to all builds are shared (default None)
         """
         self.path = path
         self.target = target
+        self.jobs = jobs
+
+    def getpaths(self):
+        """Return the paths this step reads and writes
+
+        make builds inside of the directory of the makefile, so it is read and
+        written
+        """
+        return [self.path], [self.path]
+
+    def getmemokey(self):
+        """Return the key identifying this step in the memo store"""
+        return ['make', os.path.abspath(os.path.expanduser(self.path)), \
+                self.target or '']
+
+    def getinputs(self):
+        """Return the inputs of this step, the fingerprint of the source tree"""
+        return memo.treefingerprint(self.path)
 
     def execute(self):
         """Execute this step"""
-        maker.make(self.path, self.target)
+        self.returncode = maker.make(self.path, self.target, jobs=self.jobs)
+
+
+def _unmemoized(step):
+    """Return the step after excluding it from memoization
+
+    Steps working in a random temporary directory never match their records
+    in the memo store, which would only pile up.
+
+    arguments:
+    step -- the step which to exclude
+    """
+    step.memoize = False
+    return step
 
 
-def gitmakesteps(path, target=None):
+def gitmakesteps(path, target=None, use_workspace=False, jobs=None, \
+        **options):
     """Return a list of steps that represent a GitMakeStep
 
     arguments:
     path -- path to the makefile
     target -- targte which to make
+    use_workspace -- whether to sync the repository into a persistent
+                     workspace instead of cloning it into a temporary
+                     directory (default False)
+    jobs -- the number of jobs of make (default None)
+    options -- further options of the clone, see zztools.utilities.git.clone
     """
+    if use_workspace:
+        ref = options.get('ref', options.get('branch', None))
+        workspace_step = WorkspaceStep(path, ref)
+        return [workspace_step, \
+                GitSyncStep(path, workspace_step.path, True, **options), \
+                MakeStep(workspace_step.path, target, jobs)]
     intermediate_path = temp.new_temp_dir_path()
-    steps = [GitCloneStep(path, intermediate_path)]
-    steps.append(MakeStep(intermediate_path, target))
+    steps = [GitCloneStep(path, intermediate_path, **options)]
+    steps.append(_unmemoized(MakeStep(intermediate_path, target, jobs)))
     steps.append(RmStep(intermediate_path))
     return steps
 
@@ -92,16 +165,26 @@ def gitmakestep(*args, **kwargs):
     return ListStep(todolist)
 
 
-def downloadmakesteps(path, target=None):
+def downloadmakesteps(path, target=None, use_workspace=False, jobs=None):
     """Return a list of steps that represent a DownloadMakeStep
 
     arguments:
     path -- path to the makefile
     target -- targte which to make
+    use_workspace -- whether to unpack the archive into a persistent
+                     workspace instead of a temporary directory, with
+                     unpack manifests enabled unchanged files keep their
+                     modification times (default False)
+    jobs -- the number of jobs of make (default None)
     """
+    if use_workspace:
+        workspace_step = WorkspaceStep(path)
+        return [workspace_step, \
+                DownloadUnpackStep(path, workspace_step.path), \
+                MakeStep(workspace_step.path, target, jobs)]
     intermediate_path = temp.new_temp_dir_path()
-    steps = [DownloadUnpackStep(path, intermediate_path)]
-    steps.append(MakeStep(intermediate_path, target))
+    steps = [_unmemoized(DownloadUnpackStep(path, intermediate_path))]
+    steps.append(_unmemoized(MakeStep(intermediate_path, target, jobs)))
     steps.append(RmStep(intermediate_path))
     return steps
 
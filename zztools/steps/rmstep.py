@@ -11,6 +11,7 @@ class RmStep(Step):
     has no fromjson() method
 
     instance methods:
+    getpaths() -- returns the paths this step reads and writes
     execute() -- executes the step
     """
 
@@ -22,6 +23,10 @@ class RmStep(Step):
         """
         self.path = path
 
+    def getpaths(self):
+        """Return the paths this step reads and writes"""
+        return [], [self.path]
+
     def execute(self):
         """Execute this step"""
         if os.path.isdir(self.path):
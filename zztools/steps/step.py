@@ -1,5 +1,8 @@
 
 
+from zztools.exceptions import ConfigValueError
+
+
 class Step():
     """A step in a Todolist
 
@@ -14,11 +17,111 @@ class Step():
     Additionally, each step that can be instantiated should have a constructor
     that allows it to be created without a json and an execute(self) method,
     which executes the step.
+
+    Steps which only touch known paths should override getpaths(), so the
+    scheduler can run them concurrently with steps touching other paths.
+
+    Steps which can tell whether executing them changed anything should set
+    their changed attribute in execute(), so steps depending on them through
+    \"if_changed\" can be skipped.
+
+    Steps which can be memoized should override getmemokey() and getinputs(),
+    so they are skipped if their inputs didn't change since they were last
+    executed successfully. Steps executing a command should set their
+    returncode attribute, so failed executions aren't recorded. Steps writing
+    into a directory shared with other files should override getwritten(), so
+    only the files they wrote are checked instead of the whole directory.
+
+    instance methods:
+    getpaths() -- returns the paths this step reads and writes
+    getconditions() -- returns the steps this step is executed only if changed
+    getmemokey() -- returns the key identifying this step in the memo store
+    getinputs() -- returns the inputs of this step
+    getwritten() -- returns the files written by executing this step
+
+    instance variables:
+    name -- the name of the step in its todolist, can be None
+    needs -- a tuple of the names of the steps this step depends on
+    if_changed -- a tuple of the names of steps, this step is only executed if
+                  one of them changed something, if it is empty, it is always
+                  executed
+    changed -- whether executing this step changed something, None if it is
+               unknown or the step wasn't executed yet
+    memoize -- whether this step may be skipped if its inputs didn't change
+    returncode -- the returncode of the command executed by this step, None if
+                  it didn't execute one or wasn't executed yet
+    stepid -- the stable identity of this step in the journal of a run, can
+              be None
     """
 
+    name = None
+    needs = ()
+    if_changed = ()
+    changed = None
+    memoize = True
+    returncode = None
+    stepid = None
+
     def __bool__(self):
         return True
 
+    def getpaths(self):
+        """Return the paths this step reads and writes
+
+        Returns a tuple of two lists, the first containing the paths read by
+        this step, the second the paths written by it. If None is returned,
+        the paths this step touches are unknown, which is the default.
+        """
+        return None
+
+    def getmemokey(self):
+        """Return the key identifying this step in the memo store
+
+        Returns a list of strings which identify what this step does, or None
+        if this step can't be memoized, which is the default.
+        """
+        return None
+
+    def getinputs(self):
+        """Return the inputs of this step
+
+        Returns a json serializable value which changes whenever the result of
+        executing this step would change, or None if it can't be determined.
+        It is checked before and recorded after executing this step.
+        """
+        return None
+
+    def getwritten(self):
+        """Return the files written by the last execution of this step
+
+        Returns a list of the paths of the files, or None if they are unknown,
+        which is the default. If it isn't None, the step is executed again if
+        one of the files changed since.
+        """
+        return None
+
+    def getconditions(self, steps_by_name):
+        """Return the steps named in the if_changed attribute of this step
+
+        arguments:
+        steps_by_name -- a dict mapping the names of the steps in the todolist
+                         of this step to the steps
+
+        exceptions:
+        ConfigValueError -- if one of the steps could not be found
+                            this error contains an attribute \"message\", which
+                            contains the errormessage
+        """
+        conditions = []
+        for name in self.if_changed:
+            try:
+                conditions.append(steps_by_name[name])
+            except KeyError:
+                message = 'Step {} in if_changed of step {} could not be ' \
+                        'found'.format(name, self.name)
+                raise ConfigValueError(message)
+        return conditions
+
     def execute(self):
         """execute this step
 
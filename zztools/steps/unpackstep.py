@@ -4,8 +4,12 @@ import uuid
 import os
 
 from .step import Step
+from zztools.exceptions import DownloadError
 from zztools.utilities import downloader
+from zztools.utilities import downloadcache
 from zztools.utilities import unpacker
+from zztools.utilities import unpackmanifest
+from zztools.utilities import usertextio
 from zztools.utilities import temp
 
 
@@ -21,9 +25,13 @@ class UnpackStep(Step):
     class methods:
     fromjson() -- returns an object of this class from a json
 
+    instance methods:
+    getwritten() -- returns the files written by executing this step
+
     instance variables:
     archive -- the path or url to the archive which to unpack
     to -- the path to where to unpack the archive, this can be None
+    sha256 -- the expected sha256 hash of a downloaded archive, can be None
     """
 
     def fromjson(stepjson, listjson):
@@ -50,12 +58,13 @@ class UnpackStep(Step):
             e.message = 'Missing attribute {} in unpack step'.format(e.args[0])
             raise
         to = command.get('to', None)
+        sha256 = command.get('sha256', None)
         if validators.url(archive):
-            return DownloadUnpackStep(archive, to)
+            return DownloadUnpackStep(archive, to, sha256)
         else:
-            return LocalUnpackStep(archive, to)
+            return LocalUnpackStep(archive, to, sha256)
 
-    def __init__(self, archive, to=None):
+    def __init__(self, archive, to=None, sha256=None):
         """Constructor
 
         arguments:
@@ -63,9 +72,37 @@ class UnpackStep(Step):
         to -- the directory where to unpack the archive to (default=None)
               if none is given, the archive will be unpacked in the current
               directory
+        sha256 -- the expected sha256 hash of the archive, only checked for
+                  downloaded archives (default=None)
         """
         self.archive = archive
         self.to = to
+        self.sha256 = sha256
+        self._written = None
+
+    def getwritten(self):
+        """Return the files written by the last execution of this step
+
+        These are the unpacked members of the archive. If the names of the
+        members are unknown, because the archive was unpacked by patool, all
+        files in the destination are returned.
+        """
+        return self._written
+
+    def _setwritten(self, names):
+        """Remember the files unpacked by this step
+
+        arguments:
+        names -- the names of the members of the archive, can be None
+        """
+        todir = os.path.abspath(os.path.expanduser(self.to or os.getcwd()))
+        if names is not None:
+            self._written = sorted({os.path.normpath(os.path.join(todir, \
+                    name)) for name in names})
+            return
+        self._written = []
+        for root, dirs, files in os.walk(todir):
+            self._written.extend(os.path.join(root, name) for name in files)
 
 
 class LocalUnpackStep(UnpackStep):
@@ -74,12 +111,36 @@ class LocalUnpackStep(UnpackStep):
     This class inherits from UnpackStep
 
     instance methods:
+    getpaths() -- returns the paths this step reads and writes
+    getmemokey() -- returns the key identifying this step in the memo store
+    getinputs() -- returns the inputs of this step
     execute() -- executes the step
     """
 
+    def getpaths(self):
+        """Return the paths this step reads and writes"""
+        return [self.archive], [self.to or os.getcwd()]
+
+    def getmemokey(self):
+        """Return the key identifying this step in the memo store"""
+        return ['unpack', os.path.abspath(os.path.expanduser(self.archive)), \
+                os.path.abspath(os.path.expanduser(self.to or os.getcwd()))]
+
+    def getinputs(self):
+        """Return the inputs of this step
+
+        The inputs are the size and modification time of the archive. The
+        unpacked files are checked through getwritten().
+        """
+        try:
+            result = os.stat(os.path.expanduser(self.archive))
+        except OSError:
+            return None
+        return [result.st_size, result.st_mtime_ns]
+
     def execute(self):
         """Unpacks the archive at the given path"""
-        unpacker.unpack(self.archive, self.to)
+        self._setwritten(unpacker.unpack(self.archive, self.to))
 
 
 class DownloadUnpackStep(UnpackStep):
@@ -88,17 +149,71 @@ class DownloadUnpackStep(UnpackStep):
     This class inherits from UnpackStep
 
     instance methods:
+    getpaths() -- returns the paths this step reads and writes
+    getmemokey() -- returns the key identifying this step in the memo store
+    getinputs() -- returns the inputs of this step
     execute() -- executes the step
     """
 
+    _validators = None
+
+    def getpaths(self):
+        """Return the paths this step reads and writes"""
+        return [], [self.to or os.getcwd()]
+
+    def getmemokey(self):
+        """Return the key identifying this step in the memo store"""
+        return ['unpack', self.archive, \
+                os.path.abspath(os.path.expanduser(self.to or os.getcwd()))]
+
+    def getinputs(self):
+        """Return the inputs of this step
+
+        The inputs are the expected hash of the archive, or the validators of
+        its url if no hash is given. The validators are only requested once,
+        not again after executing this step. The unpacked files are checked
+        through getwritten().
+        """
+        if self.sha256 is not None:
+            return [self.sha256]
+        if self._validators is None:
+            try:
+                # wrapped in a list, since the url may have no validators
+                self._validators = [downloader.getvalidators(self.archive)]
+            except DownloadError:
+                return None
+        if self._validators[0] is None:
+            return None
+        return [self._validators[0]]
+
     def execute(self):
         """Downloads the archive from the given url and unpacks it
 
-        This method downloads the archive from the url in self to a random
-        filename in the tempdir, unpacks that file to the path in self and
-        deletes the tempfile
+        If a sha256 hash is given and the archive with that hash is already
+        unpacked unchanged to the path in self, nothing is downloaded. Tar
+        archives are unpacked while they are downloaded, unless the download
+        has to go through the downloadcache or be checked against a hash. If
+        the unpackmanifest recorded the same validators of the url and the
+        destination is unchanged, the download stops before the archive is
+        read. Otherwise this method downloads the archive from the url in self
+        to a random filename in the tempdir, unpacks that file to the path in
+        self and deletes the tempfile
         """
+        if self.sha256 is not None and unpackmanifest.enabled \
+                and unpackmanifest.is_unpacked(self.to or os.getcwd(), \
+                self.sha256):
+            usertextio.print_verbose('{} is already unpacked to {}'.format( \
+                    self.archive, self.to or os.getcwd()))
+            self._setwritten(unpackmanifest.read(self.to or os.getcwd()) \
+                    ['members'])
+            return
+        if unpacker.is_streamable(self.archive) and self.sha256 is None \
+                and not downloadcache.enabled:
+            with downloader.openurl(self.archive) as response:
+                self._setwritten(unpacker.unpack_stream(response, self.to, \
+                        self.archive, downloader.responsevalidators(response)))
+            return
         path = temp.new_temp_file_path()
-        downloader.download(self.archive, tofile=path)
-        unpacker.unpack(path, self.to)
+        downloader.download(self.archive, tofile=path, sha256=self.sha256)
+        self._setwritten(unpacker.unpack(path, self.to))
         os.remove(path)
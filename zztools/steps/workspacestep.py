@@ -0,0 +1,46 @@
+from .step import Step
+from zztools.utilities import workspace
+
+
+class WorkspaceStep(Step):
+    """A step that marks a persistent workspace as used
+
+    The workspace is marked when this step is executed, not when the todolist
+    is read, so validating a todolist doesn't touch the workspaces and the
+    least recently used ones are only removed in runs which use workspaces.
+
+    this step isn't intended to be used by the user directly, hence it has no
+    fromjson() method
+
+    instance methods:
+    getpaths() -- returns the paths this step reads and writes
+    execute() -- executes the step
+
+    instance variables:
+    source -- the url of the source which is built in the workspace
+    ref -- the branch, tag or commit of the source, can be None
+    path -- the path of the workspace
+    """
+
+    def __init__(self, source, ref=None):
+        """Constructor
+
+        arguments:
+        source -- the url of the source which is built in the workspace
+        ref -- the branch, tag or commit of the source (default None)
+        """
+        self.source = source
+        self.ref = ref
+        self.path = workspace.getworkspace(source, ref)
+
+    def getpaths(self):
+        """Return the paths this step reads and writes
+
+        Other workspaces may be removed, but never the ones used in the same
+        run, so only the own workspace counts as written.
+        """
+        return [], [self.path]
+
+    def execute(self):
+        """Execute this step"""
+        workspace.useworkspace(self.source, self.ref)
@@ -1,5 +1,10 @@
 import zztools.steps as Steps
+import zztools.steps.lazystep as lazystep_mod
+import zztools.steps.liststep as liststep_mod
 from zztools import configfilemanager
+from zztools import journal
+from zztools.utilities import usertextio
+import zztools.scheduler as scheduler_mod
 from zztools.exceptions import ConfigValueError
 
 
@@ -13,6 +18,7 @@ class TodoList():
     multiplefromfile() -- returns multiple TodoList objects from a file
 
     instance methods:
+    validate() -- constructs all steps to check the todolist for errors
     execute() -- executes the todolist
 
     instance variables:
@@ -90,7 +96,7 @@ class TodoList():
             e.message = 'File with todolists at {} could not be found'.format(e.filename)
             raise
         try:
-            todolist = fromjson(json)
+            todolist = TodoList.fromjson(json, name)
         except (KeyError, ConfigValueError) as e:
             e.message = e.message + ' at {}'.format(path)
             e.filename = path
@@ -174,7 +180,81 @@ class TodoList():
         """
         self.steps = steps
 
-    def execute(self):
-        """Executes the steps of this todolist in order"""
+    def validate(self):
+        """Construct all steps of this todolist to check them for errors
+
+        Expensive steps, like collection and list steps, are only constructed
+        when they are executed. This constructs them right away, including the
+        steps of nested todolists, so errors in the config are found without
+        executing anything. The dependencies of the steps are checked like the
+        Scheduler does it, so they must not form a circle.
+
+        exceptions:
+        FileNotFoundError -- if the file at the given path is not found
+                             this error contains an attribute \"message\", which
+                             contains the errormessage
+        UnsupportedFileTypeError -- if a file has the wrong type (extension)
+                                    this error contains an attribute
+                                    \"message\", which contains the
+                                    errormessage
+        KeyError -- if a needed attribute in the json is not found
+                    this error contains an attribute \"message\", which
+                    contains the errormessage
+        ConfigValueError -- if some attribute in the config has an invalid value
+                            or the steps depend on each other in a circle
+                            this error contains an attribute \"message\", which
+                            contains the errormessage
+        """
+        self._validatesteps()
+        scheduler_mod.Scheduler(self, 1)
+
+    def _validatesteps(self):
+        """Construct and check the steps of this and all nested todolists"""
+        steps_by_name = {step.name: step for step in self.steps \
+                if step.name is not None}
         for step in self.steps:
-            step.execute()
+            step.getconditions(steps_by_name)
+            for name in step.needs:
+                if name not in steps_by_name:
+                    message = 'Step {} needed by step {} could not be ' \
+                            'found'.format(name, step.name)
+                    raise ConfigValueError(message)
+            if isinstance(step, lazystep_mod.LazyStep):
+                step = step.resolve()
+            if isinstance(step, liststep_mod.ListStep):
+                step.todolist._validatesteps()
+
+    def execute(self, jobs=None):
+        """Executes the steps of this todolist
+
+        A step with an if_changed attribute is skipped if none of the steps
+        named in it changed something. Steps which don't know whether they
+        changed something count as changed. If memoization is enabled, steps
+        whose inputs didn't change since their last execution are skipped.
+
+        arguments:
+        jobs -- the maximum number of steps to execute at the same time, if it
+                is None or 1, the steps are executed in order, otherwise they
+                are executed by a Scheduler (default None)
+
+        exceptions:
+        ConfigValueError -- if the steps can't be scheduled because of their
+                            needs or a step in if_changed doesn't exist
+                            this error contains an attribute \"message\", which
+                            contains the errormessage
+        """
+        if jobs is not None and jobs > 1:
+            scheduler_mod.Scheduler(self, jobs).execute()
+        else:
+            steps_by_name = {step.name: step for step in self.steps \
+                    if step.name is not None}
+            for step in self.steps:
+                conditions = step.getconditions(steps_by_name)
+                if conditions and all(condition.changed is False \
+                        for condition in conditions):
+                    usertextio.print_verbose('Skipping step {}, nothing it ' \
+                            'depends on changed'.format(step.name))
+                    step.changed = False
+                    continue
+                journal.execute(step)
+                scheduler_mod.checkfailed(step)
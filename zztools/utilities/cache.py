@@ -0,0 +1,94 @@
+import os
+import json
+import hashlib
+import threading
+import contextlib
+
+_cachedirname = 'zztools'
+
+
+def cache_dir(*parts):
+    """Return the path to a directory in the cache of zztools
+
+    The cache is located in $XDG_CACHE_HOME/zztools, or ~/.cache/zztools if
+    XDG_CACHE_HOME is not set. The directory is created if it doesn't exist yet.
+
+    arguments:
+    parts -- the parts of the path of the directory inside of the cache
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    path = os.path.join(base, _cachedirname, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def cache_key(*parts):
+    """Return a string usable as a filename which identifies the given parts
+
+    arguments:
+    parts -- strings which together identify something in the cache
+    """
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+
+def temppath(path):
+    """Return a path next to path for writing it before moving it into place
+
+    The path is unique to the process and thread, so files written at the
+    same time don't overwrite each other's temporary files.
+
+    arguments:
+    path -- the path of the file or directory which is written
+    """
+    return '{}.{}.{}'.format(path, os.getpid(), threading.get_ident())
+
+
+@contextlib.contextmanager
+def atomic_write(path, binary=False):
+    """Open a temporary file which replaces the file at path once it is closed
+
+    Readers see either the old or the complete new file. If an exception is
+    raised while writing, the temporary file is removed and path is untouched.
+
+    arguments:
+    path -- the path of the file which to write
+    binary -- whether to open the file in binary mode (default False)
+    """
+    writepath = temppath(path)
+    try:
+        with open(writepath, 'wb' if binary else 'w') as file:
+            yield file
+        os.replace(writepath, path)
+    except BaseException:
+        try:
+            os.remove(writepath)
+        except OSError:
+            pass
+        raise
+
+
+def readjson(path, default=None):
+    """Return the json stored in the file at path
+
+    Returns default if the file doesn't exist or can't be parsed.
+
+    arguments:
+    path -- the path of the file
+    default -- the value returned if the file can't be read (default None)
+    """
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def writejson(path, value):
+    """Store the value as json in the file at path, replacing it atomically
+
+    arguments:
+    path -- the path of the file
+    value -- the json serializable value which to write
+    """
+    with atomic_write(path) as file:
+        json.dump(value, file, separators=(',', ':'))
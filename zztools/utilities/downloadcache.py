@@ -0,0 +1,224 @@
+import os
+import time
+import fcntl
+import shutil
+import hashlib
+import threading
+
+from zztools.utilities import cache
+from zztools.utilities import downloader
+from zztools.utilities import usertextio
+from zztools.exceptions import DownloadError
+
+# whether downloads go through the cache
+enabled = False
+
+# the maximum size of all cached files in bytes
+max_size = 5 * 1024 ** 3
+
+# the ioctl request number to clone a file on linux (FICLONE)
+_ficlone = 0x40049409
+
+_lock = threading.Lock()
+
+# the sha256 hashes of the files used by this process, they are not evicted
+# while it runs, so they can't disappear before they are placed
+_used = set()
+
+
+def _getobjectsdir():
+    """Return the directory containing the cached files"""
+    return cache.cache_dir('downloads', 'objects')
+
+
+def _getindexpath():
+    """Return the path to the index of the cache"""
+    return os.path.join(cache.cache_dir('downloads'), 'index.json')
+
+
+def _readindex():
+    """Return the index of the cache
+
+    The index is a dict mapping each cached url to a dict of its sha256 hash,
+    its filename, the validators returned by the server and the time it was
+    last used.
+    """
+    return cache.readjson(_getindexpath(), {})
+
+
+def _place(objectpath, path):
+    """Place the cached file at path without copying it if possible
+
+    The file is reflinked if the filesystem supports it, otherwise copied, so
+    the placed file never shares its data with the cache. The directory of
+    path is created if it doesn't exist.
+
+    arguments:
+    objectpath -- the path of the cached file
+    path -- the path where to place the file
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.lexists(path):
+        os.remove(path)
+    try:
+        with open(objectpath, 'rb') as source, open(path, 'wb') as target:
+            fcntl.ioctl(target.fileno(), _ficlone, source.fileno())
+        return
+    except OSError:
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.copyfile(objectpath, path)
+
+
+def _store(response):
+    """Store the body of the response in the cache
+
+    Returns a tuple of the sha256 hash and the size of the body
+
+    arguments:
+    response -- the response whose body to store
+    """
+    objectsdir = _getobjectsdir()
+    temppath = cache.temppath(os.path.join(objectsdir, 'tmp'))
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temppath, 'wb') as file:
+            while True:
+                chunk = response.read(downloader.chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                file.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        os.chmod(temppath, 0o444)
+        with _lock:
+            _used.add(sha256)
+            os.replace(temppath, os.path.join(objectsdir, sha256))
+    except BaseException:
+        if os.path.exists(temppath):
+            os.remove(temppath)
+        raise
+    return sha256, size
+
+
+def _evict(index):
+    """Remove the least recently used files until the cache fits max_size
+
+    Files used by this process are never removed. It must be called while
+    holding _lock.
+
+    arguments:
+    index -- the index of the cache, it is modified
+    """
+    objectsdir = _getobjectsdir()
+    lastused = {}
+    for entry in index.values():
+        lastused[entry['sha256']] = max(entry.get('used', 0), \
+                lastused.get(entry['sha256'], 0))
+    sizes = {}
+    for name in os.listdir(objectsdir):
+        if not name.startswith('tmp.'):
+            sizes[name] = os.path.getsize(os.path.join(objectsdir, name))
+    total = sum(sizes.values())
+    for sha256 in sorted(sizes, key=lambda sha256: lastused.get(sha256, 0)):
+        if total <= max_size:
+            break
+        if sha256 in _used:
+            continue
+        os.remove(os.path.join(objectsdir, sha256))
+        total -= sizes[sha256]
+        for url in [url for url, entry in index.items() \
+                if entry['sha256'] == sha256]:
+            del index[url]
+
+
+def _targetpath(filename, todir=None, tofile=None):
+    """Return the path where to place a download
+
+    arguments:
+    filename -- the name of the downloaded file
+    todir -- the directory to download to (default None)
+    tofile -- the file to download to (default None)
+    """
+    if tofile:
+        return os.path.expanduser(tofile)
+    return os.path.join(os.path.expanduser(todir or os.getcwd()), filename)
+
+
+def download(url, todir=None, tofile=None, sha256=None):
+    """Download a given url through the cache
+
+    If the url is cached, it is revalidated with the server using the ETag
+    and Last-Modified headers of the cached response, so unchanged files are
+    not downloaded again. If a sha256 hash is given and a file with that hash
+    is cached, the server isn't contacted at all. Cached files are placed with
+    a reflink if possible, otherwise they are copied. If the file has another
+    hash than the given one, the cache isn't updated. Returns the path of the
+    downloaded file.
+
+    arguments:
+    url -- the url which to download
+    todir -- the path to the directory to download to, the file is named after
+             the last part of the url (default None)
+    tofile -- the path to the file to download to (default None)
+    sha256 -- the expected sha256 hash of the file (default None)
+
+    exceptions:
+    DownloadError -- if the download failed or the file has another hash
+                     this error contains an attribute \"message\", which
+                     contains the errormessage
+    """
+    objectsdir = _getobjectsdir()
+    with _lock:
+        index = _readindex()
+        entry = index.get(url)
+        if entry is not None:
+            _used.add(entry['sha256'])
+        if sha256 is not None:
+            _used.add(sha256)
+    if entry is not None \
+            and not os.path.exists(os.path.join(objectsdir, entry['sha256'])):
+        entry = None
+    if sha256 is not None and os.path.exists(os.path.join(objectsdir, sha256)):
+        if entry is None or entry['sha256'] != sha256:
+            entry = {'sha256': sha256, 'filename': downloader._filename(url), \
+                    'etag': None, 'last_modified': None}
+        usertextio.print_verbose('Using cached {} by its hash'.format(url))
+    else:
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        with downloader._request(url, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                usertextio.print_verbose('Using cached {}, it is unchanged' \
+                        .format(url))
+            elif response.status >= 400:
+                message = 'Could not download {}: HTTP status {}'.format(url, \
+                        response.status)
+                raise DownloadError(message, url)
+            else:
+                stored, size = _store(response)
+                entry = {'sha256': stored, \
+                        'filename': downloader._filename(url), \
+                        'etag': response.headers.get('ETag'), \
+                        'last_modified': response.headers.get('Last-Modified')}
+                usertextio.print_verbose('Downloaded {} into the cache ({})' \
+                        .format(url, downloader._formatsize(size)))
+    if sha256 is not None and entry['sha256'] != sha256:
+        message = 'Download of {} has sha256 {} instead of {}'.format(url, \
+                entry['sha256'], sha256)
+        raise DownloadError(message, url)
+    entry['used'] = time.time()
+    with _lock:
+        index = _readindex()
+        index[url] = entry
+        _evict(index)
+        cache.writejson(_getindexpath(), index)
+    path = _targetpath(entry['filename'], todir, tofile)
+    _place(os.path.join(objectsdir, entry['sha256']), path)
+    return path
@@ -1,15 +1,353 @@
-from .executor import execute_command
+import os
+import time
+import hashlib
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
 
-def download(url, todir=None, tofile=None):
+from zztools.utilities import usertextio
+from zztools.utilities import downloadcache
+from zztools.exceptions import DownloadError
+
+# the size of the chunks in which downloads are written to disk
+chunk_size = 1024 * 1024
+
+# the maximum number of redirects followed for one url
+_max_redirects = 10
+
+# the time in seconds after which a connection attempt or read is aborted
+_timeout = 60
+
+_redirect_statuses = (301, 302, 303, 307, 308)
+
+
+class _ConnectionPool():
+    """A pool of idle http connections, by scheme, host and port
+
+    instance methods:
+    get() -- returns a connection to a host
+    put() -- returns a connection to the pool
+    """
+
+    def __init__(self):
+        """Constructor"""
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, scheme, netloc):
+        """Return an idle or new connection to the given host
+
+        arguments:
+        scheme -- either http or https
+        netloc -- the host and optionally port of the url
+        """
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop()
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=_timeout)
+        return http.client.HTTPConnection(netloc, timeout=_timeout)
+
+    def put(self, scheme, netloc, connection):
+        """Return the connection to the pool, so it can be reused
+
+        arguments:
+        scheme -- either http or https
+        netloc -- the host and optionally port of the url
+        connection -- the connection, its last response has to be read fully
+        """
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(connection)
+
+
+_pool = _ConnectionPool()
+
+
+class _Response():
+    """A response to a request, which returns its connection to the pool
+
+    instance methods:
+    read() -- reads a part of the body
+    close() -- closes the response
+
+    instance variables:
+    url -- the url of the response, after following redirects
+    status -- the status code of the response
+    headers -- the headers of the response
+    """
+
+    def __init__(self, url, response, connection, key):
+        """Constructor
+
+        arguments:
+        url -- the url of the response
+        response -- the http.client.HTTPResponse or urllib response
+        connection -- the pooled connection of the response, can be None
+        key -- a tuple of the scheme and host of the connection
+        """
+        self.url = url
+        self.status = response.status
+        self.headers = response.headers
+        self._response = response
+        self._connection = connection
+        self._key = key
+
+    def read(self, size=-1):
+        """Read and return up to size bytes of the body
+
+        arguments:
+        size -- the maximum number of bytes to read, if negative, the whole
+                rest of the body is read (default -1)
+        """
+        if size < 0:
+            return self._response.read()
+        return self._response.read(size)
+
+    def close(self):
+        """Close the response
+
+        If the body was read completely and the server keeps the connection
+        open, the connection is returned to the pool, otherwise it is closed.
+        """
+        connection, self._connection = self._connection, None
+        if connection is None:
+            self._response.close()
+            return
+        if self._response.isclosed() and not self._response.will_close:
+            _pool.put(*self._key, connection)
+        else:
+            self._response.close()
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _request(url, method='GET', headers=None):
+    """Send a request for the url over a pooled connection
+
+    Redirects are followed. If a proxy is configured for the scheme of the
+    url, urllib is used instead of a pooled connection.
+
+    arguments:
+    url -- the url which to request
+    method -- the method of the request (default GET)
+    headers -- a dict of additional headers (default None)
+
+    exceptions:
+    DownloadError -- if the url is invalid, too many redirects happened or the
+                     connection failed
+    """
+    headers = dict(headers or {})
+    for _ in range(_max_redirects + 1):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise DownloadError('Unsupported url {}'.format(url), url)
+        if parts.scheme in urllib.request.getproxies():
+            request = urllib.request.Request(url, headers=headers, method=method)
+            try:
+                response = urllib.request.urlopen(request, timeout=_timeout)
+            except urllib.error.HTTPError as e:
+                response = e
+            except OSError as e:
+                raise DownloadError('Could not download {}: {}'.format(url, e), url)
+            return _Response(response.url, response, None, None)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        key = (parts.scheme, parts.netloc)
+        connection = _pool.get(*key)
+        try:
+            try:
+                connection.request(method, target, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, \
+                    BrokenPipeError):
+                # the pooled connection was closed by the server, retry once
+                connection.close()
+                connection.request(method, target, headers=headers)
+                response = connection.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise DownloadError('Could not download {}: {}'.format(url, e), url)
+        result = _Response(url, response, connection, key)
+        location = response.headers.get('Location')
+        if response.status not in _redirect_statuses or not location:
+            return result
+        result.read()
+        result.close()
+        url = urllib.parse.urljoin(url, location)
+    raise DownloadError('Too many redirects for {}'.format(url), url)
+
+
+def openurl(url):
+    """Open the given url for reading
+
+    Returns a response, whose body can be read with its read() method. It has
+    to be closed after use, it can be used as a context manager for that.
+
+    arguments:
+    url -- the url which to open
+
+    exceptions:
+    DownloadError -- if the url couldn't be opened
+                     this error contains an attribute \"message\", which
+                     contains the errormessage
+    """
+    response = _request(url)
+    if response.status >= 400:
+        response.close()
+        message = 'Could not download {}: HTTP status {}'.format(url, \
+                response.status)
+        raise DownloadError(message, url)
+    return response
+
+
+def getvalidators(url):
+    """Return the validators of the current version of the url
+
+    The validators are requested with a HEAD request. Returns a list of the
+    url after following redirects, the ETag and the Last-Modified header, or
+    None if the server sends neither of them.
+
+    arguments:
+    url -- the url which to check
+
+    exceptions:
+    DownloadError -- if the url couldn't be requested
+                     this error contains an attribute \"message\", which
+                     contains the errormessage
+    """
+    with _request(url, 'HEAD') as response:
+        response.read()
+        if response.status >= 400:
+            return None
+        return responsevalidators(response)
+
+
+def responsevalidators(response):
+    """Return the validators of the version of the url sent in the response
+
+    Returns a list of the url after following redirects, the ETag and the
+    Last-Modified header, or None if the response contains neither of them.
+
+    arguments:
+    response -- a response returned by openurl()
+    """
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag is None and last_modified is None:
+        return None
+    return [response.url, etag, last_modified]
+
+
+def _filename(url):
+    """Return the name of the file for the url, like wget names it
+
+    Like wget, the file is named after the requested url, not the one it
+    redirects to.
+
+    arguments:
+    url -- the url which to download
+    """
+    return os.path.basename(urllib.parse.urlsplit(url).path) or 'index.html'
+
+
+def _formatsize(size):
+    """Return the given number of bytes as a human readable string"""
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            return '{:.1f} {}'.format(size, unit)
+        size /= 1024
+
+
+def _writeresponse(response, path, sha256=None):
+    """Write the body of the response to the file at path
+
+    The body is written to a temporary file next to path in large chunks,
+    which is moved to path once the download completed and its hash matched.
+    The directory of path is created if it doesn't exist, like wget does it.
+    Returns the number of bytes written.
+
+    arguments:
+    response -- the response whose body to write
+    path -- the path of the file
+    sha256 -- the expected sha256 hash of the body, if None, it isn't checked
+              (default None)
+
+    exceptions:
+    DownloadError -- if the body has another sha256 hash
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temppath = '{}.part'.format(path)
+    digest = hashlib.sha256() if sha256 is not None else None
+    size = 0
+    try:
+        with open(temppath, 'wb') as file:
+            while True:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                if digest is not None:
+                    digest.update(chunk)
+                file.write(chunk)
+                size += len(chunk)
+        if digest is not None and digest.hexdigest() != sha256:
+            message = 'Download of {} has sha256 {} instead of {}'.format( \
+                    response.url, digest.hexdigest(), sha256)
+            raise DownloadError(message, response.url)
+        os.replace(temppath, path)
+    except BaseException:
+        if os.path.exists(temppath):
+            os.remove(temppath)
+        raise
+    return size
+
+
+def download(url, todir=None, tofile=None, sha256=None):
     """Download a given url
 
+    Connections to the same host are reused between downloads. If the
+    downloadcache is enabled, the download goes through it. Returns the path
+    of the downloaded file.
+
     arguments:
     url -- the url which to download
-    todir -- the path to the directory to download to
-    tofile -- the path to the file to download to
-    """
-    if todir:
-        command = 'wget -P {} {}'.format(todir, url)
-    elif tofile:
-        command = 'wget -O {} {}'.format(tofile, url)
-    execute_command(command)
+    todir -- the path to the directory to download to, the file is named after
+             the last part of the url (default None)
+    tofile -- the path to the file to download to, if neither todir nor tofile
+              are given, the file is downloaded into the current directory
+              (default None)
+    sha256 -- the expected sha256 hash of the file, if it doesn't match, the
+              file isn't written (default None)
+
+    exceptions:
+    DownloadError -- if the download failed
+                     this error contains an attribute \"message\", which
+                     contains the errormessage
+    """
+    if downloadcache.enabled:
+        return downloadcache.download(url, todir, tofile, sha256)
+    start = time.monotonic()
+    with _request(url) as response:
+        if response.status >= 400:
+            message = 'Could not download {}: HTTP status {}'.format(url, \
+                    response.status)
+            raise DownloadError(message, url)
+        if tofile:
+            path = os.path.expanduser(tofile)
+        else:
+            path = os.path.join(os.path.expanduser(todir or os.getcwd()), \
+                    _filename(url))
+        size = _writeresponse(response, path, sha256)
+    duration = max(time.monotonic() - start, 1e-6)
+    usertextio.print_verbose('Downloaded {} ({} in {:.1f}s, {}/s)'.format(url, \
+            _formatsize(size), duration, _formatsize(size / duration)))
+    return path
+
@@ -1,13 +1,51 @@
 import types
 import sys
+import time
+import signal
 import subprocess
+import threading
+import collections
 import os
+import warnings
 
 from zztools.utilities import usertextio
+from zztools.utilities.sudosession import SudoSession
+from zztools.exceptions import SudoSessionError
+
+class CommandResult():
+    """The result of an executed command
+
+    instance variables:
+    returncode -- the returncode of the command
+    duration -- the time in seconds the command ran
+    tail -- a list of the last lines of the output of the command, including
+            their newlines, empty if the output wasn't captured
+    """
+
+    def __init__(self, returncode, duration, tail=()):
+        """Constructor
+
+        arguments:
+        returncode -- the returncode of the command
+        duration -- the time in seconds the command ran
+        tail -- the last lines of the output of the command (default ())
+        """
+        self.returncode = returncode
+        self.duration = duration
+        self.tail = list(tail)
+
 
 class Executor(types.ModuleType):
 
     _override_sudo = None
+    _sudo_session = None
+    _processes = set()
+    _processes_lock = threading.Lock()
+    _cancelled = False
+    # the time in seconds a terminated command gets to exit before it is killed
+    terminate_timeout = 5
+    # the number of the last lines of the output kept in a CommandResult
+    tail_lines = 20
 
     def is_sudo_overridden(self) -> bool:
         """returns whether sudo is overridden or not"""
@@ -48,9 +86,199 @@ class Executor(types.ModuleType):
         """deletes the current value of _override_sudo"""
         self._override_sudo = None
 
-    def execute_command(self, command: str, sudo=False, quiet=False):
+    def start_sudo_session(self) -> bool:
+        """Start a sudo session for the commands executed with sudo
+
+        While a sudo session is running, commands which are executed with sudo
+        are sent to one privileged helper process started with sudo, instead
+        of running sudo for every command. If the helper can't be started, a
+        warning is issued and sudo is run for every command. Returns whether
+        the session was started.
+        """
+        if self._sudo_session is not None:
+            return True
+        try:
+            self._sudo_session = SudoSession()
+        except SudoSessionError as e:
+            message = '{}, using sudo for every command'.format(e.message)
+            warnings.warn(message, UserWarning)
+            return False
+        return True
+
+    def stop_sudo_session(self):
+        """Stop the sudo session if one is running"""
+        if self._sudo_session is not None:
+            self._sudo_session.close()
+            self._sudo_session = None
+
+    def _execute_in_sudo_session(self, command, write=None, stderr=True, \
+            capture=False):
+        """Executes the given command in the sudo session
+
+        Returns a tuple of the returncode and the output of the command, or
+        None if the sudo session stopped working before the command was sent
+        to it, in which case it is stopped. If it stopped working after that,
+        the command may have been executed already, so it counts as failed
+        instead of being executed again.
+
+        arguments:
+        command -- the command as a list of its parts, without sudo
+        write -- a function which is called with each line of the output
+                 while the command runs (default None)
+        stderr -- whether to include stderr in the output (default True)
+        capture -- whether to return the output, otherwise it is None
+                   (default False)
+        """
+        session = self._sudo_session
+        try:
+            return session.execute(command, write, stderr, capture)
+        except SudoSessionError as e:
+            if self._sudo_session is session:
+                message = '{}, using sudo for every command'.format(e.message)
+                warnings.warn(message, UserWarning)
+                self._sudo_session = None
+            if e.sent:
+                message = 'Command {} may not have finished, not executing ' \
+                        'it again'.format(' '.join(command))
+                warnings.warn(message, UserWarning)
+                return 1, None
+            return None
+
+    def validate_sudo(self) -> bool:
+        """Ask for the sudo password now, if sudo would ask for it
+
+        Commands running at the same time as others can't ask for the sudo
+        password, so it is asked for once beforehand. Returns whether sudo can
+        be used without a password afterwards.
+        """
+        if self._sudo_session is not None:
+            return True
+        try:
+            return subprocess.run(['sudo', '-v']).returncode == 0
+        except FileNotFoundError:
+            return False
+
+    def _terminate(self, process):
+        """Terminate the process, killing it if it doesn't exit in time
+
+        arguments:
+        process -- the subprocess.Popen object of the process
+        """
+        try:
+            process.terminate()
+            process.wait(self.terminate_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        except OSError:
+            pass
+
+    def cancel_commands(self):
+        """Terminate all running commands and fail the ones started afterwards
+
+        Commands executed in the sudo session can't be terminated. Commands
+        fail right away until resume_commands() is called.
+        """
+        with self._processes_lock:
+            self._cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            threading.Thread(target=self._terminate, args=(process,)).start()
+
+    def resume_commands(self):
+        """Execute commands again after cancel_commands() was called"""
+        with self._processes_lock:
+            self._cancelled = False
+
+    def _run(self, command, prefix=None, timeout=None, stdin=None, \
+            stdout=None, env=None, pass_fds=(), stream=False):
+        """Executes the given command and returns its CommandResult
+
+        The command can be terminated by cancel_commands(). If it runs longer
+        than its timeout, it is terminated and a warning is issued.
+
+        arguments:
+        command -- the command as a list of its parts
+        prefix -- if given, the output is streamed like with stream and each
+                  line starts with the prefix in brackets, so the output of
+                  commands running at the same time stays readable
+                  (default: None)
+        timeout -- the time in seconds after which the command is terminated,
+                   if None, it can run as long as it needs (default: None)
+        stdin -- the stdin of the command, if None, it is inherited
+                 (default: None)
+        stdout -- the stdout of the command, if None, it is inherited, ignored
+                  if the output is streamed (default: None)
+        env -- the environment of the command, if None, it is inherited
+               (default: None)
+        pass_fds -- file descriptors which the command inherits (default: ())
+        stream -- whether the stdout and stderr of the command are written to
+                  stdout line by line, the last lines are kept in the result
+                  (default: False)
+        """
+        stream = stream or prefix is not None
+        output = {}
+        if stream:
+            output = {'stdout': subprocess.PIPE, 'stderr': subprocess.STDOUT, \
+                    'text': True, 'errors': 'replace'}
+        elif stdout is not None:
+            output = {'stdout': stdout}
+        tail = collections.deque(maxlen=self.tail_lines)
+        start = time.monotonic()
+        with self._processes_lock:
+            if self._cancelled:
+                return CommandResult(-signal.SIGTERM, 0)
+            process = subprocess.Popen(command, stdin=stdin, env=env, \
+                    pass_fds=pass_fds, **output)
+            self._processes.add(process)
+        timer = None
+        timedout = []
+        if timeout is not None:
+            def expire():
+                timedout.append(True)
+                self._terminate(process)
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+            timer.start()
+        try:
+            if stream:
+                with process.stdout:
+                    for line in process.stdout:
+                        tail.append(line)
+                        usertextio.write_line(line, prefix)
+            returncode = process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            with self._processes_lock:
+                self._processes.discard(process)
+        if timedout:
+            message = 'Command {} was terminated after {} seconds'.format( \
+                    ' '.join(command), timeout)
+            warnings.warn(message, UserWarning)
+        return CommandResult(returncode, time.monotonic() - start, tail)
+
+    def execute_command(self, command: str, sudo=False, quiet=False, prefix=None, \
+            env=None, pass_fds=(), timeout=None, interactive=True):
+        """Executes the given command and returns its returncode
+
+        Takes the same arguments as run_command().
+        """
+        return self.run_command(command, sudo, quiet, prefix, env, pass_fds, \
+                timeout, interactive).returncode
+
+    def run_command(self, command: str, sudo=False, quiet=False, prefix=None, \
+            env=None, pass_fds=(), timeout=None, interactive=True):
         """Executes the given command, with sudo of the given value
 
+        Returns a CommandResult of the command. The output of commands which
+        can't ask for input is streamed line by line and its last lines are
+        kept in the result, interactive commands write to the terminal
+        directly. If a sudo session is running, commands with sudo are
+        executed in it, unless they have a timeout, need file descriptors
+        passed to them or may ask for input, since the sudo session has no
+        terminal. While commands are cancelled by cancel_commands(), the
+        command isn't executed and fails right away.
+
         Warning: this functions behavior depends on the value of the override_sudo
         property of this module
 
@@ -58,6 +286,20 @@ class Executor(types.ModuleType):
         command -- the command which to execute
         sudo -- whether or not to use sudo (default: False)
         quiet -- whether or not to silence stdout (default: False)
+        prefix -- if given, the output of the command, including stderr, is
+                  written to stdout line by line with this prefix and the
+                  command can't ask for input, not even sudo for its password
+                  (default: None)
+        env -- the environment of the command, if None, it is inherited, not
+               supported for commands run in the sudo session (default: None)
+        pass_fds -- file descriptors which the command inherits, sudo closes
+                    them (default: ())
+        timeout -- the time in seconds after which the command is terminated,
+                   if None, it can run as long as it needs (default: None)
+        interactive -- whether the command may ask for input, e.g. for a
+                       confirmation, so it needs the terminal, ignored if
+                       prefix is given, since the command can't ask for input
+                       then (default: True)
         """
         # check if quiet is overridden globally
         if usertextio.is_quiet_overridden():
@@ -71,9 +313,61 @@ class Executor(types.ModuleType):
         if self.is_sudo_overridden():
             sudo = self.override_sudo
         command = command.split(' ')
+        if prefix is not None:
+            interactive = False
+        if sudo and self._sudo_session is not None and timeout is None \
+                and not pass_fds and not interactive:
+            tail = collections.deque(maxlen=self.tail_lines)
+            write = None
+            if not quiet:
+                def write(line):
+                    tail.append(line)
+                    usertextio.write_line(line, prefix)
+            start = time.monotonic()
+            result = self._execute_in_sudo_session(command, write)
+            if result is not None:
+                return CommandResult(result[0], time.monotonic() - start, tail)
+        if sudo and prefix is not None:
+            command = ['sudo', '-n'] + command
+        elif sudo:
+            command = ['sudo'] + command
+        stdin = subprocess.DEVNULL if prefix is not None else None
+        return self._run(command, None if quiet else prefix, timeout, stdin, \
+                out, env, pass_fds, not quiet and not interactive)
+
+    def capture_command(self, command: str, sudo=False):
+        """Executes the given command and returns its output
+
+        Returns the stdout of the command as a string, or None if the command
+        failed. The stderr of the command is discarded. If a sudo session is
+        running, commands with sudo are executed in it.
+
+        Warning: this functions behavior depends on the value of the override_sudo
+        property of this module
+
+        arguments:
+        command -- the command which to execute
+        sudo -- whether or not to use sudo (default: False)
+        """
+        if self.is_sudo_overridden():
+            sudo = self.override_sudo
+        command = command.split(' ')
+        if sudo and self._sudo_session is not None:
+            result = self._execute_in_sudo_session(command, stderr=False, \
+                    capture=True)
+            if result is not None:
+                returncode, output = result
+                return output if returncode == 0 else None
         if sudo:
             command = ['sudo'] + command
-        subprocess.run(command, stderr=sys.stderr, stdout=out)
+        try:
+            result = subprocess.run(command, stdout=subprocess.PIPE, \
+                    stderr=subprocess.DEVNULL, text=True)
+        except FileNotFoundError:
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout
 
 
 # change out the module for the class, so properties can be used
@@ -1,18 +1,110 @@
 import os
+import fcntl
+import shutil
 import urllib
 
 from git import Repo
+from git.exc import GitCommandError
 
 from zztools.exceptions import ConfigValueError
+from zztools.utilities import cache
+from zztools.utilities import usertextio
 
+# whether clones are made from local mirrors of the repositories
+use_mirrors = False
 
-def clone(url, todir=None):
+# the directory containing the mirrors, if None, they are kept in the cache
+mirror_dir = None
+
+
+def _getmirrorpath(url):
+    """Return the path of the bare mirror of the repository at url
+
+    arguments:
+    url -- the url to the repo
+    """
+    if mirror_dir is None:
+        directory = cache.cache_dir('git')
+    else:
+        directory = os.path.expanduser(mirror_dir)
+        os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, cache.cache_key(url) + '.git')
+
+
+def update_mirror(url):
+    """Create or update the bare mirror of the repository at url
+
+    A new mirror is cloned with all refs, an existing one only fetches what
+    changed since its last update. The mirror is locked while it is updated,
+    so concurrent clones of the same repository wait for each other. Returns
+    the path of the mirror.
+
+    arguments:
+    url -- the url to the repo, eiter ssh or https
+    """
+    path = _getmirrorpath(url)
+    with open(path + '.lock', 'w') as lockfile:
+        fcntl.flock(lockfile, fcntl.LOCK_EX)
+        if os.path.isdir(path):
+            usertextio.print_verbose('Fetching {} into its mirror'.format(url))
+            Repo(path).git.fetch('--prune', '--tags', 'origin')
+        else:
+            usertextio.print_verbose('Mirroring {}'.format(url))
+            temppath = cache.temppath(path)
+            try:
+                Repo.clone_from(url, temppath, mirror=True)
+                os.rename(temppath, path)
+            except BaseException:
+                shutil.rmtree(temppath, ignore_errors=True)
+                raise
+    return path
+
+
+def _checkoutref(repo, ref, depth=None):
+    """Check out the given ref in the repository, fetching it if needed
+
+    arguments:
+    repo -- the git.Repo in which to check out the ref
+    ref -- a commit, tag or branch
+    depth -- the depth with which to fetch the ref, if None, its whole history
+             is fetched (default None)
+    """
+    try:
+        repo.git.rev_parse('--verify', '--quiet', ref + '^{commit}')
+    except GitCommandError:
+        kwargs = {} if depth is None else {'depth': depth}
+        repo.git.fetch('origin', ref, **kwargs)
+        ref = 'FETCH_HEAD'
+    repo.git.checkout('--detach', ref)
+
+
+def clone(url, todir=None, depth=None, branch=None, ref=None, filter=None, \
+        sparse=None, submodule_depth=None):
     """Clone a repository
 
+    If use_mirrors is set, the local mirror of the repository is updated and
+    the repository is cloned from it, which hardlinks its objects if possible.
+    The origin of the clone still points to url afterwards. Shallow and
+    partial clones are made from url directly, since they fetch only a part
+    of the repository anyway.
+
     arguments:
     url -- the url to the repo, eiter ssh or https
     todir -- the directory to where to clone the repository, if none is
              specified, it is cloned into the current directory
+    depth -- the number of commits of history to fetch, if None, the whole
+             history is fetched (default None)
+    branch -- the branch or tag to check out, if None, the default branch of
+              the remote is checked out (default None)
+    ref -- a commit, tag or branch to check out after cloning, it is fetched
+           if it isn't part of the clone (default None)
+    filter -- the object filter for a partial clone, e.g. blob:none
+              (default None)
+    sparse -- a list of the paths to check out, if None, everything is
+              checked out (default None)
+    submodule_depth -- if given, the submodules are initialized recursively
+                       with this depth of history, 0 means the whole history
+                       (default None)
 
     exceptions:
     ConfigValueError -- if no todir is given and the name of the repo couldnt
@@ -21,7 +113,119 @@ def clone(url, todir=None):
     if not todir:
         reponame = get_repo_name_from_url(url)
         todir = os.path.join(os.getcwd(), reponame)
-    Repo.clone_from(url, todir)
+    kwargs = {}
+    if depth is not None:
+        kwargs['depth'] = depth
+    if branch is not None:
+        kwargs['branch'] = branch
+    if filter is not None:
+        kwargs['filter'] = filter
+    if sparse is not None:
+        kwargs['sparse'] = True
+    if ref is not None:
+        kwargs['no_checkout'] = True
+    if use_mirrors and depth is None and filter is None:
+        repo = Repo.clone_from(update_mirror(url), todir, **kwargs)
+        repo.remote('origin').set_url(url)
+    else:
+        repo = Repo.clone_from(url, todir, **kwargs)
+    if sparse is not None:
+        repo.git.sparse_checkout('set', *sparse)
+    if ref is not None:
+        _checkoutref(repo, ref, depth)
+    if submodule_depth is not None:
+        args = ['update', '--init', '--recursive']
+        if submodule_depth:
+            args += ['--depth', str(submodule_depth)]
+        repo.git.submodule(*args)
+
+
+def sync(url, todir=None, depth=None, branch=None, ref=None, filter=None, \
+        sparse=None, submodule_depth=None, reset=False):
+    """Bring a checkout of a repository up to date, cloning it if needed
+
+    If todir isn't a repository yet, it is cloned with the given options.
+    Otherwise only the new objects of the requested ref are fetched and the
+    checkout is fast-forwarded to it. With a depth, the fetched commit shares
+    no history with the checkout, so the checkout is moved to it, keeping
+    local changes unless they conflict with it. A ref is checked out detached
+    and a branch other than the current one is checked out, both without a
+    merge. Returns whether the checked out commit changed.
+
+    arguments:
+    url -- the url to the repo, eiter ssh or https
+    todir -- the directory of the checkout, if none is specified, it is the
+             name of the repository in the current directory
+    depth -- the number of commits of history to fetch, if None, the whole
+             history is fetched (default None)
+    branch -- the branch to update to, if None and no ref is given, the
+              current branch is updated, or the default branch of the remote
+              if the checkout is detached (default None)
+    ref -- a commit, tag or branch to check out detached (default None)
+    filter -- the object filter for a partial clone, only used if the
+              repository is cloned (default None)
+    sparse -- a list of the paths to check out, if None, the sparse checkout
+              of an existing checkout isn't changed (default None)
+    submodule_depth -- if given, the submodules are updated recursively with
+                       this depth of history, 0 means the whole history
+                       (default None)
+    reset -- whether to reset the checkout to the fetched commit, discarding
+             local changes, if it can't be fast-forwarded (default False)
+
+    exceptions:
+    ConfigValueError -- if no todir is given and the name of the repo couldnt
+                        be found in the repository url
+    git.exc.GitCommandError -- if fetching failed or the checkout can't be
+                               fast-forwarded and reset isn't set
+    """
+    if not todir:
+        todir = os.path.join(os.getcwd(), get_repo_name_from_url(url))
+    if not os.path.isdir(os.path.join(todir, '.git')):
+        clone(url, todir, depth, branch, ref, filter, sparse, submodule_depth)
+        return True
+    repo = Repo(todir)
+    before = repo.head.commit.hexsha if repo.head.is_valid() else None
+    if sparse is not None:
+        repo.git.sparse_checkout('set', *sparse)
+    current = None if repo.head.is_detached else repo.active_branch.name
+    if ref is not None:
+        wanted = ref
+    elif branch is not None:
+        wanted = branch
+    elif current is not None:
+        wanted = current
+    else:
+        wanted = 'HEAD'
+    source = 'origin'
+    if use_mirrors and depth is None:
+        source = update_mirror(url)
+    kwargs = {} if depth is None else {'depth': depth}
+    repo.git.fetch(source, wanted, **kwargs)
+    if ref is not None:
+        repo.git.checkout('--detach', 'FETCH_HEAD')
+    elif branch is not None and branch != current:
+        repo.git.checkout('-B', branch, 'FETCH_HEAD')
+    else:
+        try:
+            if depth is None:
+                repo.git.merge('--ff-only', 'FETCH_HEAD')
+            elif current is None:
+                repo.git.checkout('--detach', 'FETCH_HEAD')
+            else:
+                # a shallow fetch has no history in common with the checkout,
+                # so the branch is moved to it instead of being fast-forwarded
+                repo.git.checkout('-B', current, 'FETCH_HEAD')
+        except GitCommandError:
+            if not reset:
+                raise
+            usertextio.print_verbose('Resetting {} to {}'.format(todir, wanted))
+            repo.git.reset('--hard', 'FETCH_HEAD')
+    if submodule_depth is not None:
+        args = ['update', '--init', '--recursive']
+        if submodule_depth:
+            args += ['--depth', str(submodule_depth)]
+        repo.git.submodule(*args)
+    return repo.head.commit.hexsha != before
 
 
 def is_git_url(url):
@@ -1,14 +1,117 @@
-from .executor import execute_command
+import os
+import threading
 
-def make(path, target=None, sudo=False):
-    """Make the Makefile at the given path
+from zztools.utilities import executor
+
+# the maximum number of make jobs running at the same time across all builds
+# sharing the jobserver, if None, it is the number of available cpus
+max_jobs = None
+
+_jobserver = None
+_jobserver_lock = threading.Lock()
+
+
+def _cpucount():
+    """Return the number of cpus this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class _Jobserver():
+    """A GNU make jobserver shared by all builds
+
+    The jobserver is a pipe filled with one token per job slot. Every make
+    connected to it has to read a token before starting a job besides its
+    first one and write it back afterwards. The first job of each make is
+    covered by a token taken before make is started, so the total number of
+    jobs never exceeds the number of slots.
+
+    instance methods:
+    acquire() -- takes a token, waiting until one is free
+    release() -- returns a token
+    getmakeflags() -- returns the MAKEFLAGS connecting make to the jobserver
+
+    instance variables:
+    slots -- the number of job slots
+    fds -- a tuple of the read and write end of the pipe
+    """
+
+    def __init__(self, slots):
+        """Constructor
+
+        arguments:
+        slots -- the number of job slots
+        """
+        self.slots = slots
+        self.fds = os.pipe()
+        os.write(self.fds[1], b'+' * slots)
+
+    def acquire(self):
+        """Take a token, waiting until one is free, and return it"""
+        return os.read(self.fds[0], 1)
+
+    def release(self, token):
+        """Return the given token
+
+        arguments:
+        token -- the token which was taken
+        """
+        os.write(self.fds[1], token)
+
+    def getmakeflags(self):
+        """Return the MAKEFLAGS connecting make to this jobserver"""
+        auth = '{},{}'.format(*self.fds)
+        return '-j{} --jobserver-auth={} --jobserver-fds={}'.format(self.slots, \
+                auth, auth)
+
+
+def _getjobserver():
+    """Return the jobserver shared by all builds, starting it if needed"""
+    global _jobserver
+    with _jobserver_lock:
+        if _jobserver is None:
+            _jobserver = _Jobserver(max_jobs or _cpucount())
+        return _jobserver
+
+
+def make(path, target=None, sudo=False, jobs=None):
+    """Make the Makefile at the given path and return the returncode of make
+
+    If no number of jobs is given, make runs as many jobs in parallel as the
+    shared jobserver allows, so builds running at the same time together
+    stay within the number of available cpus. Builds with sudo can't be
+    connected to the jobserver, since sudo closes its pipe, they run as many
+    jobs as there are cpus.
 
     arguments:
     path -- the path to the Makefile
     target -- target whicht to make (default: None)
     sudo -- whether to install with sudo rights (default: False)
+    jobs -- the number of jobs make may run in parallel, regardless of other
+            builds (default: None)
     """
     command = 'make -C {}'.format(path)
+    if executor.is_sudo_overridden():
+        sudo = executor.override_sudo
+    if jobs is None and sudo:
+        jobs = max_jobs or _cpucount()
+    if jobs is not None:
+        if jobs > 1:
+            command += ' -j{}'.format(jobs)
+        if target:
+            command += ' {}'.format(target)
+        return executor.execute_command(command, sudo, interactive=False)
     if target:
         command += ' {}'.format(target)
-    execute_command(command, sudo)
+    jobserver = _getjobserver()
+    env = dict(os.environ)
+    env['MAKEFLAGS'] = '{} {}'.format(env.get('MAKEFLAGS', ''), \
+            jobserver.getmakeflags()).strip()
+    token = jobserver.acquire()
+    try:
+        return executor.execute_command(command, sudo, env=env, \
+                pass_fds=jobserver.fds, interactive=False)
+    finally:
+        jobserver.release(token)
@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import queue
+import itertools
+import threading
+import subprocess
+
+from zztools.exceptions import SudoSessionError
+
+# the code of the helper, which runs as root and executes the commands it
+# receives on stdin, each in its own thread, sending their output and
+# returncode back on stdout, tagged with the id of their request
+_helper_code = '''
+import sys, json, threading, subprocess
+lock = threading.Lock()
+def send(message):
+    with lock:
+        sys.stdout.write(json.dumps(message) + "\\n")
+        sys.stdout.flush()
+def run(request):
+    id = request["id"]
+    try:
+        process = subprocess.Popen(request["command"], cwd=request["cwd"],
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT if request["stderr"] else subprocess.DEVNULL,
+                text=True, errors="replace")
+    except OSError as e:
+        send({"id": id, "output": "{}\\n".format(e)})
+        send({"id": id, "returncode": 127})
+        return
+    for outline in process.stdout:
+        send({"id": id, "output": outline})
+    send({"id": id, "returncode": process.wait()})
+send({"ready": True})
+for line in sys.stdin:
+    threading.Thread(target=run, args=(json.loads(line),)).start()
+'''
+
+
+class SudoSession():
+    """A long-lived privileged helper process executing commands
+
+    The helper is started with sudo once, afterwards commands are sent to it
+    over a pipe, so sudo doesn't have to be run for every command. Commands
+    are executed without a terminal. Every command gets an id, so commands
+    sent from different threads run at the same time, their output is
+    passed on line by line while they run.
+
+    instance methods:
+    execute() -- executes a command in the helper
+    close() -- stops the helper
+
+    instance variables:
+    process -- the process of the helper
+    """
+
+    def __init__(self):
+        """Constructor
+
+        Starts the helper with sudo, which may ask for a password
+
+        exceptions:
+        SudoSessionError -- if the helper couldn't be started
+        """
+        command = ['sudo', sys.executable, '-I', '-c', _helper_code]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE, \
+                    stdout=subprocess.PIPE, text=True)
+        except OSError as e:
+            raise SudoSessionError('Could not start sudo: {}'.format(e))
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._requests = {}
+        self._error = None
+        try:
+            ready = json.loads(self.process.stdout.readline() or '{}')
+        except ValueError:
+            ready = {}
+        if ready.get('ready') is not True:
+            self.close()
+            raise SudoSessionError('The privileged helper did not start')
+        self._reader = threading.Thread(target=self._receive, daemon=True)
+        self._reader.start()
+
+    def _receive(self):
+        """Pass the messages from the helper on to the waiting requests
+
+        Runs in its own thread until the helper stops. Then all requests
+        still waiting are woken up with None.
+        """
+        error = 'The privileged helper stopped working'
+        for line in self.process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                error = 'Invalid message from the privileged helper'
+                break
+            with self._lock:
+                messages = self._requests.get(message.get('id'))
+            if messages is not None:
+                messages.put(message)
+        with self._lock:
+            self._error = error
+            for messages in self._requests.values():
+                messages.put(None)
+            self._requests.clear()
+
+    def execute(self, command, write=None, stderr=True, capture=False):
+        """Execute the given command in the helper
+
+        Returns a tuple of the returncode and the output of the command, the
+        output is only kept if capture is set, otherwise it is None.
+
+        arguments:
+        command -- the command as a list of its parts
+        write -- a function which is called with each line of the output
+                 while the command runs (default None)
+        stderr -- whether to include stderr in the output, if not, it is
+                  discarded (default True)
+        capture -- whether to return the output (default False)
+
+        exceptions:
+        SudoSessionError -- if the helper stopped working, its attribute sent
+                            tells whether the command was sent to the helper
+                            before
+        """
+        messages = queue.Queue()
+        with self._lock:
+            if self._error is not None:
+                raise SudoSessionError(self._error)
+            requestid = next(self._ids)
+            request = {'id': requestid, 'command': command, \
+                    'cwd': os.getcwd(), 'stderr': stderr}
+            try:
+                self.process.stdin.write(json.dumps(request) + '\n')
+                self.process.stdin.flush()
+            except OSError as e:
+                raise SudoSessionError('The privileged helper stopped ' \
+                        'working: {}'.format(e))
+            self._requests[requestid] = messages
+        output = [] if capture else None
+        while True:
+            message = messages.get()
+            if message is None:
+                raise SudoSessionError(self._error, sent=True)
+            if 'returncode' in message:
+                with self._lock:
+                    self._requests.pop(requestid, None)
+                if capture:
+                    output = ''.join(output)
+                return message['returncode'], output
+            line = message.get('output', '')
+            if capture:
+                output.append(line)
+            if write is not None:
+                write(line)
+
+    def close(self):
+        """Stop the helper, after the commands it is executing finished"""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
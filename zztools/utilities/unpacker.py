@@ -1,16 +1,358 @@
 import patoolib
 import os
+import mmap
+import stat
+import time
+import shutil
+import tarfile
+import zipfile
+import concurrent.futures
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from zztools.utilities import usertextio
+from zztools.utilities import unpackmanifest
+
+# the size of the blocks in which streamed archives are read
+_stream_bufsize = 1024 * 1024
+
+# extensions of the archives which can be unpacked while they are read
+_streamable_extensions = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', \
+        '.tar.xz', '.txz')
+
+# extensions of tar archives compressed with zstandard
+_zstd_extensions = ('.tar.zst', '.tzst')
+
+# the first bytes of a zstandard compressed file
+_zstd_magic = b'\x28\xb5\x2f\xfd'
+
+# the maximum number of threads decompressing the members of a zip archive
+threads = min(8, os.cpu_count() or 1)
+
+
+def is_streamable(name):
+    """Check whether an archive can be unpacked while it is read
+
+    Only tar archives, optionally compressed with gzip, bzip2, xz or, if
+    zstandard is installed, zstd, can be unpacked from a stream. Formats like
+    zip have their index at the end of the archive, so they need random
+    access.
+
+    arguments:
+    name -- the name, path or url of the archive
+    """
+    name = name.lower()
+    if zstandard is not None and name.endswith(_zstd_extensions):
+        return True
+    return name.endswith(_streamable_extensions)
+
+
+def _extracttar(archive, todir, names=None):
+    """Extract the members of the opened tar archive
+
+    Unsafe members, like absolute paths or links pointing outside of todir,
+    are rejected if the python version supports extraction filters. Returns a
+    list of the names of all members of the archive.
+
+    arguments:
+    archive -- the opened tarfile.TarFile
+    todir -- the directory to which to extract
+    names -- if given, only the members with these names are extracted
+             (default None)
+    """
+    members = archive
+    if names is not None:
+        names = set(names)
+        members = (member for member in archive \
+                if os.path.normpath(member.name) in names)
+    if hasattr(tarfile, 'data_filter'):
+        archive.extractall(todir, members, filter='data')
+    else:
+        archive.extractall(todir, members)
+    return [member.name for member in archive.getmembers()]
+
+
+def _extracttarstream(fileobj, todir, zstd=False, names=None):
+    """Extract the members of the tar archive read from the file object
+
+    Returns a list of the names of all members of the archive.
+
+    arguments:
+    fileobj -- a file object from which the archive is read
+    todir -- the directory to which to extract
+    zstd -- whether the archive is compressed with zstd (default False)
+    names -- if given, only the members with these names are extracted
+             (default None)
+    """
+    if zstd:
+        fileobj = zstandard.ZstdDecompressor().stream_reader(fileobj, \
+                read_size=_stream_bufsize)
+        mode = 'r|'
+    else:
+        mode = 'r|*'
+    with tarfile.open(fileobj=fileobj, mode=mode, \
+            bufsize=_stream_bufsize) as archive:
+        return _extracttar(archive, todir, names)
+
+
+def unpack_stream(fileobj, todir=None, name=None, version=None):
+    """Unpack the tar archive read from the given file object
+
+    The archive is unpacked while it is read, so the file object doesn't need
+    to support seeking, e.g. it can be the response of a download. If the
+    unpackmanifest is enabled, the archive is hashed while it is read to
+    record the manifest of the destination. If a version is given and the
+    manifest recorded the same version, only the members which were changed
+    or removed since are unpacked, and nothing is read at all if the
+    destination is unchanged. Returns a list of the names of all members of
+    the archive.
+
+    arguments:
+    fileobj -- a file object from which the archive is read
+    todir -- the location to which to unpack the file
+    name -- the name of the archive, used to recognize zstd compressed
+            archives (default None)
+    version -- a json serializable value identifying the version of the
+               archive, e.g. the validators of its url (default None)
+    """
+    todir = os.path.expanduser(todir) if todir else os.getcwd()
+    reader = None
+    names = None
+    if unpackmanifest.enabled:
+        manifest = unpackmanifest.read(todir)
+        names = unpackmanifest.changed(manifest, todir, None, version)
+        if names == []:
+            usertextio.print_verbose('{} is already unpacked to {}'.format( \
+                    name or 'The archive', todir))
+            return list(manifest['members'])
+        if names:
+            usertextio.print_verbose('Unpacking {} changed members of {}' \
+                    .format(len(names), name or 'the archive'))
+        fileobj = reader = unpackmanifest.HashingReader(fileobj)
+    os.makedirs(todir, exist_ok=True)
+    zstd = name is not None and zstandard is not None \
+            and name.lower().endswith(_zstd_extensions)
+    allnames = _extracttarstream(fileobj, todir, zstd, names)
+    if reader is not None:
+        reader.drain()
+        unpackmanifest.write(todir, reader.hexdigest(), allnames, \
+                version=version)
+    return allnames
+
+
+class _MappedFile():
+    """A seekable file object reading from a memory mapped file
+
+    mmap objects provide read(), seek() and tell(), but zipfile also needs
+    seekable(), which this wrapper adds.
+    """
+
+    def __init__(self, mapped):
+        """Constructor
+
+        arguments:
+        mapped -- the mmap.mmap object of the file
+        """
+        self._mapped = mapped
+
+    def seekable(self):
+        return True
+
+    def __getattr__(self, name):
+        return getattr(self._mapped, name)
+
+
+def _zipmode(info):
+    """Return the unix permissions and whether the zip member is a symlink
+
+    The permissions are None if the archive wasn't created on unix.
+
+    arguments:
+    info -- the zipfile.ZipInfo of the member
+    """
+    mode = info.external_attr >> 16
+    if info.create_system != 3 or not mode:
+        return None, False
+    return stat.S_IMODE(mode), stat.S_ISLNK(mode)
+
+
+def _zipmtime(info):
+    """Return the modification time of the zip member as a timestamp
+
+    arguments:
+    info -- the zipfile.ZipInfo of the member
+    """
+    try:
+        return time.mktime(info.date_time + (0, 0, -1))
+    except (OverflowError, ValueError):
+        return None
+
+
+def _extractzipmember(archive, info, path, todir):
+    """Extract a single file of the zip archive to path
+
+    arguments:
+    archive -- the opened zipfile.ZipFile
+    info -- the zipfile.ZipInfo of the member
+    path -- the path to which to write the member
+    todir -- the real path of the directory to which the archive is extracted
+
+    exceptions:
+    zipfile.BadZipFile -- if the member is a link pointing outside of todir
+    """
+    mode, islink = _zipmode(info)
+    if islink:
+        target = archive.read(info).decode()
+        linked = os.path.realpath(os.path.join(os.path.dirname(path), target))
+        if os.path.commonpath([todir, linked]) != todir:
+            raise zipfile.BadZipFile('Link {} points outside of the ' \
+                    'destination'.format(info.filename))
+        if os.path.lexists(path):
+            os.remove(path)
+        os.symlink(target, path)
+        return
+    with archive.open(info) as source, open(path, 'wb') as target:
+        shutil.copyfileobj(source, target, _stream_bufsize)
+
+
+def _extractzip(path, todir, names=None):
+    """Extract the members of the zip archive at path
+
+    The archive is mapped into memory and the members are decompressed by
+    multiple threads. Directories are created beforehand and permissions and
+    modification times are set for all members once they are extracted.
+    Returns a list of the names of all members of the archive.
+
+    arguments:
+    path -- the path of the zip archive
+    todir -- the directory to which to extract
+    names -- if given, only the members with these names are extracted
+             (default None)
+
+    exceptions:
+    zipfile.BadZipFile -- if a member would be extracted outside of todir
+                          or is a link pointing outside of it
+    """
+    todir = os.path.realpath(todir)
+    with open(path, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+            zipfile.ZipFile(_MappedFile(mapped)) as archive:
+        allnames = archive.namelist()
+        if names is not None:
+            names = set(names)
+        members = []
+        for info in archive.infolist():
+            if names is not None \
+                    and os.path.normpath(info.filename) not in names:
+                continue
+            target = os.path.normpath(os.path.join(todir, info.filename))
+            parent = os.path.realpath(os.path.dirname(target))
+            if os.path.commonpath([todir, parent]) != todir:
+                raise zipfile.BadZipFile('Member {} of {} is outside of ' \
+                        'the destination'.format(info.filename, path))
+            members.append((info, target))
+        files = []
+        for info, target in members:
+            if info.is_dir():
+                os.makedirs(target, exist_ok=True)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                files.append((info, target))
+        with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+            futures = [pool.submit(_extractzipmember, archive, info, target, \
+                    todir) for info, target in files]
+        for future in futures:
+            future.result()
+    # directories last and deepest first, so setting their times sticks
+    members.sort(key=lambda member: (member[0].is_dir(), -len(member[1])))
+    for info, target in members:
+        mode, islink = _zipmode(info)
+        if islink:
+            continue
+        if mode is not None:
+            os.chmod(target, mode)
+        mtime = _zipmtime(info)
+        if mtime is not None:
+            os.utime(target, (mtime, mtime))
+    return allnames
+
+
+def _unpacknative(path, todir, names=None):
+    """Unpack the archive at path without starting another program
+
+    Returns a list of the names of all members of the archive, or None if the
+    format of the archive isn't supported natively.
+
+    arguments:
+    path -- the path of the archive
+    todir -- the directory to which to unpack
+    names -- if given, only the members with these names are unpacked
+             (default None)
+    """
+    if zipfile.is_zipfile(path):
+        usertextio.print_verbose('Unpacking {} as zip'.format(path))
+        os.makedirs(todir, exist_ok=True)
+        return _extractzip(path, todir, names)
+    with open(path, 'rb', buffering=_stream_bufsize) as file:
+        if file.peek(len(_zstd_magic))[:len(_zstd_magic)] == _zstd_magic:
+            if zstandard is None:
+                return None
+            usertextio.print_verbose('Unpacking {} as tar.zst'.format(path))
+            os.makedirs(todir, exist_ok=True)
+            return _extracttarstream(file, todir, True, names)
+        try:
+            archive = tarfile.open(fileobj=file, mode='r:*')
+        except tarfile.ReadError:
+            return None
+        usertextio.print_verbose('Unpacking {} as tar'.format(path))
+        os.makedirs(todir, exist_ok=True)
+        with archive:
+            return _extracttar(archive, todir, names)
+
 
 def unpack(path, todir=None):
     """Unpack the given file
 
+    Tar archives, optionally compressed with gzip, bzip2, xz or, if zstandard
+    is installed, zstd, and zip archives are unpacked natively. The format is
+    recognized by the content of the file. All other formats are unpacked by
+    patool.
+
+    If the unpackmanifest is enabled, natively unpacked archives are recorded
+    in a manifest of the destination. If the same archive is unpacked to the
+    same destination again, only the members which were changed or removed
+    since are unpacked, and nothing at all if the destination is unchanged.
+
+    Returns a list of the names of all members of the archive, or None if it
+    was unpacked by patool.
+
     arguments:
     path -- the path to the file which to unpack
     todir -- the location to which to unpack the file
     """
     path = os.path.expanduser(path)
-    if todir:
-        todir = os.path.expanduser(todir)
+    todir = os.path.expanduser(todir) if todir else os.getcwd()
+    if not unpackmanifest.enabled:
+        allnames = _unpacknative(path, todir)
+        if allnames is None:
+            patoolib.extract_archive(path, outdir=todir)
+        return allnames
+    manifest = unpackmanifest.read(todir)
+    sha256 = unpackmanifest.archivehash(path, manifest)
+    names = unpackmanifest.changed(manifest, todir, sha256)
+    if names == []:
+        usertextio.print_verbose('{} is already unpacked to {}'.format(path, \
+                todir))
+        return list(manifest['members'])
+    if names:
+        usertextio.print_verbose('Unpacking {} changed members of {}'.format( \
+                len(names), path))
+    allnames = _unpacknative(path, todir, names)
+    if allnames is None:
         patoolib.extract_archive(path, outdir=todir)
-    else:
-        patoolib.extract_archive(path)
+        return None
+    unpackmanifest.write(todir, sha256, allnames, path)
+    return allnames
@@ -0,0 +1,196 @@
+import os
+import json
+import stat
+import hashlib
+
+from zztools.utilities import cache
+
+# whether unpacking records manifests and skips unchanged destinations, off by
+# default, since it hashes every archive, even ones unpacked only once
+enabled = False
+
+# the size of the chunks in which archives are hashed
+_chunk_size = 1024 * 1024
+
+
+class HashingReader():
+    """A file object wrapper computing the sha256 hash of what is read
+
+    instance methods:
+    read() -- reads from the wrapped file object
+    drain() -- reads the rest of the wrapped file object
+    hexdigest() -- returns the hash of everything read so far
+    """
+
+    def __init__(self, fileobj):
+        """Constructor
+
+        arguments:
+        fileobj -- the file object which to wrap
+        """
+        self._fileobj = fileobj
+        self._digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        """Read and return up to size bytes
+
+        arguments:
+        size -- the maximum number of bytes to read (default -1)
+        """
+        data = self._fileobj.read(size)
+        self._digest.update(data)
+        return data
+
+    def drain(self):
+        """Read the rest of the wrapped file object, so the hash is complete"""
+        while self.read(_chunk_size):
+            pass
+
+    def hexdigest(self):
+        """Return the sha256 hash of everything read so far"""
+        return self._digest.hexdigest()
+
+
+def hash_file(path):
+    """Return the sha256 hash of the file at path
+
+    arguments:
+    path -- the path of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(_chunk_size)
+            if not chunk:
+                return digest.hexdigest()
+            digest.update(chunk)
+
+
+def _getpath(todir):
+    """Return the path of the manifest of the destination directory
+
+    arguments:
+    todir -- the directory an archive is unpacked to
+    """
+    return os.path.join(cache.cache_dir('unpack'), \
+            cache.cache_key(os.path.realpath(todir)) + '.json')
+
+
+def _archivestat(path):
+    """Return a list identifying the version of the archive file at path
+
+    arguments:
+    path -- the path of the archive
+    """
+    result = os.stat(path)
+    return [os.path.realpath(path), result.st_size, result.st_mtime_ns]
+
+
+def _memberstat(path):
+    """Return a list describing the unpacked member at path, or None
+
+    Files are described by their size and modification time, links by their
+    target and directories only by their type. None is returned if the member
+    doesn't exist.
+
+    arguments:
+    path -- the path of the unpacked member
+    """
+    try:
+        result = os.lstat(path)
+    except OSError:
+        return None
+    if stat.S_ISDIR(result.st_mode):
+        return ['d']
+    if stat.S_ISLNK(result.st_mode):
+        return ['l', os.readlink(path)]
+    return ['f', result.st_size, result.st_mtime_ns]
+
+
+def read(todir):
+    """Return the manifest of the destination directory, or None
+
+    A manifest is a dict containing the sha256 hash of the archive last
+    unpacked to the directory, the version of the archive, if it was streamed,
+    and a dict mapping the names of its members to their description after
+    unpacking.
+
+    arguments:
+    todir -- the directory an archive is unpacked to
+    """
+    return cache.readjson(_getpath(todir))
+
+
+def write(todir, sha256, names, archivepath=None, version=None):
+    """Write the manifest of the destination directory
+
+    arguments:
+    todir -- the directory the archive was unpacked to
+    sha256 -- the sha256 hash of the archive
+    names -- the names of the members of the archive
+    archivepath -- the path of the archive, if it is a local file, so it
+                   doesn't have to be hashed again while unchanged
+                   (default None)
+    version -- a json serializable value identifying the version of a
+               streamed archive, e.g. the validators of its url, so it can be
+               recognized before it is read (default None)
+    """
+    manifest = {'sha256': sha256, 'archive': None, 'version': version, \
+            'members': {}}
+    if archivepath is not None:
+        manifest['archive'] = _archivestat(archivepath)
+    for name in names:
+        name = os.path.normpath(name)
+        manifest['members'][name] = _memberstat(os.path.join(todir, name))
+    cache.writejson(_getpath(todir), manifest)
+
+
+def archivehash(path, manifest=None):
+    """Return the sha256 hash of the archive at path
+
+    If the manifest recorded the archive at the same path with the same size
+    and modification time, its hash is used instead of reading the archive.
+
+    arguments:
+    path -- the path of the archive
+    manifest -- the manifest of the destination directory (default None)
+    """
+    if manifest is not None and manifest.get('archive') == _archivestat(path):
+        return manifest['sha256']
+    return hash_file(path)
+
+
+def changed(manifest, todir, sha256, version=None):
+    """Return the names of the members which differ from the manifest
+
+    Returns None if the manifest is for another archive, so all members have
+    to be unpacked, and an empty list if the destination is unchanged. The
+    archive is identified by its sha256 hash, or by its version if the hash
+    isn't known.
+
+    arguments:
+    manifest -- the manifest of the destination directory, can be None
+    todir -- the directory the archive was unpacked to
+    sha256 -- the sha256 hash of the archive, can be None
+    version -- the version of the archive, used if sha256 is None
+               (default None)
+    """
+    if manifest is None:
+        return None
+    if sha256 is not None and manifest.get('sha256') != sha256:
+        return None
+    if sha256 is None \
+            and (version is None or manifest.get('version') != version):
+        return None
+    return [name for name, description in manifest['members'].items() \
+            if _memberstat(os.path.join(todir, name)) != description]
+
+
+def is_unpacked(todir, sha256):
+    """Check whether the archive with the hash is unpacked unchanged to todir
+
+    arguments:
+    todir -- the directory the archive is unpacked to
+    sha256 -- the sha256 hash of the archive
+    """
+    return changed(read(todir), todir, sha256) == []
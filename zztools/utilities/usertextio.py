@@ -1,5 +1,6 @@
 import types
 import sys
+import threading
 
 
 _stdout_save = sys.stdout
@@ -14,6 +15,8 @@ class UserTextIO(types.ModuleType):
 
     _override_quiet = None
     _override_yesno = None
+    _output_lock = threading.Lock()
+    verbose = False
     _yesno_answer_map = {'y': True, 'Y': True, 'yes': True, 'Yes': True,
                          'n': False, 'N': False, 'no': False, 'No':False}
 
@@ -103,6 +106,35 @@ class UserTextIO(types.ModuleType):
         """deletes the current value of _override_yesno"""
         self._override_yesno = None
 
+    def print_verbose(self, text):
+        """Prints the given text, but only if verbose is set
+
+        arguments:
+        text -- the text which to print
+        """
+        if self.verbose:
+            print(text)
+
+    def write_line(self, line, prefix=None, err=False):
+        """Writes a line of output of a command
+
+        The line is written at once, so lines written from multiple threads
+        don't get mixed up.
+
+        arguments:
+        line -- the line which to write, including the newline
+        prefix -- if given, the line is prefixed with it in brackets
+                  (default None)
+        err -- whether to write the line to stderr instead of stdout
+               (default False)
+        """
+        if prefix is not None:
+            line = '[{}] {}'.format(prefix, line)
+        stream = sys.stderr if err else sys.stdout
+        with self._output_lock:
+            stream.write(line)
+            stream.flush()
+
     def _yesno_choicefield(self, default=False):
         """returns a yesno choice field
 
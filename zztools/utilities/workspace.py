@@ -0,0 +1,86 @@
+import os
+import time
+import fcntl
+import shutil
+
+from zztools.utilities import cache
+from zztools.utilities import usertextio
+
+# the maximum number of workspaces kept, the least recently used ones beyond
+# it are removed
+max_count = 16
+
+# the keys of the workspaces used by this process
+_used = set()
+
+
+def _getindexpath():
+    """Return the path to the index of the workspaces"""
+    return os.path.join(cache.cache_dir('workspaces'), 'index.json')
+
+
+def _readindex():
+    """Return the index of the workspaces
+
+    The index is a dict mapping the key of each workspace to a dict of the
+    source it was created for and the time it was last used.
+    """
+    return cache.readjson(_getindexpath(), {})
+
+
+def _evict(index):
+    """Remove the least recently used workspaces beyond max_count
+
+    Workspaces used by this process are never removed, so there can be more
+    than max_count workspaces if a run uses more of them.
+
+    arguments:
+    index -- the index of the workspaces, it is modified
+    """
+    keys = sorted(index, key=lambda key: index[key]['used'], reverse=True)
+    for key in keys[max_count:]:
+        if key in _used:
+            continue
+        usertextio.print_verbose('Removing the workspace of {}'.format( \
+                index[key]['source']))
+        shutil.rmtree(os.path.join(cache.cache_dir('workspaces'), key), \
+                ignore_errors=True)
+        del index[key]
+
+
+def getworkspace(source, ref=None):
+    """Return the path of the persistent workspace for the given source
+
+    The workspace is a directory in the cache which is kept between runs, so
+    a source can be updated and built in place instead of starting from
+    scratch. The directory itself isn't created and the workspace isn't marked
+    as used, which useworkspace() does once the workspace is needed.
+
+    arguments:
+    source -- the url of the source which is built in the workspace
+    ref -- the branch, tag or commit of the source, sources with different
+           refs get different workspaces (default None)
+    """
+    return os.path.join(cache.cache_dir('workspaces'), \
+            cache.cache_key(source, ref or ''))
+
+
+def useworkspace(source, ref=None):
+    """Mark the workspace for the given source as used and return its path
+
+    The least recently used workspaces are removed if there are more than
+    max_count, except the ones used by this process.
+
+    arguments:
+    source -- the url of the source which is built in the workspace
+    ref -- the branch, tag or commit of the source (default None)
+    """
+    key = cache.cache_key(source, ref or '')
+    _used.add(key)
+    with open(_getindexpath() + '.lock', 'w') as lockfile:
+        fcntl.flock(lockfile, fcntl.LOCK_EX)
+        index = _readindex()
+        index[key] = {'source': source, 'ref': ref, 'used': time.time()}
+        _evict(index)
+        cache.writejson(_getindexpath(), index)
+    return os.path.join(cache.cache_dir('workspaces'), key)